@@ -84,15 +84,22 @@ FIXME: The logging module name is used (__init__.debug)
 """
 
 import os
+import random
+import re
 import sys
 
 import logging
 import logging.handlers
 
+import collections
+import functools
 import inspect
+import itertools
 #import string
 import threading
+import time
 import traceback
+import weakref
 
 try:
     import wx
@@ -124,6 +131,7 @@ __all__ = [
     'info',
     #
     'assert_soft',
+    'timed',
 ]
 
 """
@@ -207,49 +215,572 @@ VERBOSE5 = 5
 VERBOSE = 5
 NOTSET = logging.NOTSET
 
+# SYNC_ME: Log levels.
+level_numbers = {
+    'TERMINAL': TERMINAL,
+    'CRITICAL': CRITICAL,
+    'FATAL': FATAL,
+    'ERROR': ERROR,
+    'WARNING': WARNING,
+    'WARN': WARN,
+    'NOTICE': NOTICE,
+    'INFO': INFO,
+    'TRACE': TRACE,
+    'DEBUG': DEBUG,
+    'VERBOSE1': VERBOSE1,
+    'VERBOSE2': VERBOSE2,
+    'VERBOSE3': VERBOSE3,
+    'VERBOSE4': VERBOSE4,
+    'VERBOSE5': VERBOSE5,
+    'VERBOSE': VERBOSE,
+    'NOTSET': NOTSET,
+}
+
 # ***
 
 APACHE_REQUEST = None
 
 # *** 
 
-def config_line_format(frmat_len, frmat_postfix, line_len=None, add_tid=False):
-    global msg_continuation_prefix
-    global line_len_log
-    global line_len_msg
-    global include_thread_id
-    if line_len == 0:
-        # Most terminals' widths are 80 chars, right?
-        line_len = 80
-    msg_continuation_prefix = (' ' * frmat_len) + frmat_postfix
-    line_len_log = line_len
-    include_thread_id = add_tid
-    if line_len_log is not None:
-        line_len_msg = line_len_log - len(msg_continuation_prefix)
-    else:
-        line_len_msg = None
+# A handler's line layout: how wide the first line is, and the prefix
+# and width of the continuation lines. Each handler can have its own
+# (handler.layout, or init_logging's log_layouts), else it uses the
+# config's. Handlers with equal layouts (and the same formatter) share
+# one rendered result per record.
+
+class Line_Layout(object):
+
+    __slots__ = (
+        'line_len_log',
+        'line_len_msg',
+        'msg_continuation_prefix',
+        'key',
+    )
+
+    def __init__(self, line_len=None, frmat_len=0, frmat_postfix='| '):
+        """
+        A line_len of None means don't wrap; 0 means 80; and 'terminal'
+        means the terminal's width (when the layout's made).
+        """
+        set_ = object.__setattr__
+        if line_len == 'terminal':
+            line_len = _terminal_width()
+        elif line_len == 0:
+            # Most terminals' widths are 80 chars, right?
+            line_len = 80
+        prefix = (' ' * frmat_len) + frmat_postfix
+        if line_len is not None:
+            # (At least one char per line, else wrapping never ends.)
+            line_len_msg = max(1, line_len - len(prefix))
+        else:
+            line_len_msg = None
+        set_(self, 'line_len_log', line_len)
+        set_(self, 'line_len_msg', line_len_msg)
+        set_(self, 'msg_continuation_prefix', prefix)
+        set_(self, 'key', (line_len, line_len_msg, prefix))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Line_Layout is immutable')
+
+    def __eq__(self, other):
+        return isinstance(other, Line_Layout) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return 'Line_Layout(line_len_log=%r, line_len_msg=%r, prefix=%r)' % self.key
+
+    def render(self, fmt, record):
+        return My_Handler.render(
+            fmt,
+            record,
+            self.line_len_log,
+            self.line_len_msg,
+            self.msg_continuation_prefix,
+        )
+
+def _terminal_width():
+    try:
+        import shutil
+        return shutil.get_terminal_size().columns
+    except (AttributeError, ImportError, ValueError, OSError):
+        # Python 2, or no terminal.
+        return 80
 
 # *** 
 
+# The formatting and sink options are kept in one immutable Log_Config.
+# Handlers and loggers read the module-level config once per record, e.g.,
+#
+#   cfg = config
+#   if cfg.line_len_log is None: ...
+#
+# and reconfigure() (or init_logging(), or config_line_format()) swaps in
+# a new Log_Config with one assignment, so a reader never sees a
+# half-updated config.
+
+class Log_Config(object):
+    """
+    An immutable snapshot of the logging config.
+
+    The options are the same as init_logging's; the rest of the
+    attributes are derived from them.
+    """
+
+    # SYNC_ME: init_logging's options and their defaults.
+    options = (
+        ('log_level', logging.INFO),
+        ('log_fname', None),
+        ('log_frmat', None),
+        ('log_dfmat', None),
+        ('log_to_file', False),
+        ('log_to_console', False),
+        ('log_to_stderr', False),
+        ('log_to_wx', False),
+        ('log_frmat_len', 0),
+        #('log_frmat_postfix', '#'),
+        ('log_frmat_postfix', '| '),
+        ('log_line_len', None),
+        ('add_thread_id', False),
+        ('show_logger_name', False),
+        ('show_mod_func_line', False),
+        ('level_overrides', None),
+        ('log_bin_fname', None),
+        ('dedupe_tracebacks', False),
+        ('log_to_syslog', None),
+        ('log_syslog_transport', None),
+        ('log_to_socket', None),
+        ('log_fast_records', False),
+        ('log_thread_buffers', False),
+        ('log_zip_fname', None),
+        ('log_zip_codec', 'gzip'),
+        # Per-sink layouts, e.g., {'console': {'line_len': 'terminal'},
+        # 'file': {'line_len': None}}; see Line_Layout for the options.
+        ('log_layouts', None),
+        # Budgets for the backpressure controller, e.g.,
+        # {'max_records_per_sec': 5000}; see Backpressure_Controller.
+        ('log_backpressure', None),
+    )
+
+    __slots__ = tuple(name for name, default in options) + (
+        'msg_continuation_prefix',
+        'line_len_log',
+        'line_len_msg',
+        'include_thread_id',
+        'show_logger_name_',
+        'show_mod_func_line_',
+        'log_frmat_',
+        'log_dfmat_',
+        'fast_records_',
+        'layout',
+        'layouts_',
+        # The level override memo, keyed by (logger name, call-site
+        # module). It's a cache, so it's the one mutable bit, and it's
+        # thrown out with the config it belongs to.
+        'override_lookup',
+    )
+
+    def __init__(self, **options):
+        set_ = object.__setattr__
+        for name, default in Log_Config.options:
+            set_(self, name, options.pop(name, default))
+        if options:
+            raise TypeError('Unknown logging options: %s' % (', '.join(sorted(options)),))
+        set_(self, 'log_level', level_value(self.log_level))
+        set_(self, 'level_overrides', dict(
+            (name, level_value(level))
+            for name, level in (self.level_overrides or {}).items()
+        ))
+        set_(self, 'override_lookup', {})
+
+        layout = Line_Layout(self.log_line_len, self.log_frmat_len, self.log_frmat_postfix)
+        set_(self, 'layout', layout)
+        set_(self, 'msg_continuation_prefix', layout.msg_continuation_prefix)
+        set_(self, 'line_len_log', layout.line_len_log)
+        set_(self, 'line_len_msg', layout.line_len_msg)
+        layouts = {}
+        for kind, layout_options in (self.log_layouts or {}).items():
+            if not isinstance(layout_options, Line_Layout):
+                layout_options = Line_Layout(**dict(
+                    [
+                        ('line_len', self.log_line_len),
+                        ('frmat_len', self.log_frmat_len),
+                        ('frmat_postfix', self.log_frmat_postfix),
+                    ]
+                    + list(layout_options.items())
+                ))
+            layouts[kind] = layout_options
+        set_(self, 'layouts_', layouts)
+        set_(self, 'include_thread_id', self.add_thread_id)
+
+        show_logger_name = self.show_logger_name
+        show_mod_func_line = self.show_mod_func_line
+        if (not show_logger_name) and (not show_mod_func_line):
+            show_mod_func_line = True
+        set_(self, 'show_logger_name_', show_logger_name)
+        set_(self, 'show_mod_func_line_', show_mod_func_line)
+
+        log_frmat = self.log_frmat
+        if not log_frmat:
+            # See class Formatter in /usr/lib/python2.7/logging/__init__.py for options.
+            #
+            # NOTE: Skipping:
+            #
+            #   %(asctime)s -- Textual time when the LogRecord was created
+            #                   See: log_dfmat (next!)
+            #   %(created)s -- time.time() when LogRecord was created
+            #   %(msecs)s   -- silly. just the msec. portion of %(created)s
+            #   %(relativeCreated)s -- since start of logger;
+            #                           could be interesting for niche applications
+            #
+            #   %(module)s   --   We cannot use Formatter's special variables to
+            #   %(funcName)s --    show the fcn. name and line, e.g.,
+            #   %(lineno)s   --     %(module)s.%(funcName)s:%(lineno)s
+            #                --    because that's us! E.g.,
+            #                --     logging2.notice:199
+            # so My_Handler.format sets them from the call site.
+            #
+            log_frmat = (
+                #'%%(asctime)s %%(levelname)-4s %s%s%s %%(message)s'
+                '%%(levelname)-4s|%%(asctime)s|%s%s%s%%(message)s'
+                % (
+                    '%(name)-11s ' if show_logger_name else '',
+                    #'%(name)-11s|' if show_logger_name else '',
+                    #'${mod_func_line} ' if show_mod_func_line else '',
+                    #'%(module)s.%(funcName)s:%(lineno)s ' if show_mod_func_line else '',
+                    '%(module)s.%(funcName)s:%(lineno)s' if show_mod_func_line else '',
+                    self.log_frmat_postfix,
+                )
+            )
+
+# FIXME: UNTESTED:
+        if self.include_thread_id:
+          # FIXME: 2016-06-27: this code is Untested.
+          # FIXME: See My_Logger._log, which maybe doesn't need to use threading.
+          log_frmat = '%%(thread)8d %s' % (log_frmat,)
+        set_(self, 'log_frmat_', log_frmat)
+
+        log_dfmat = self.log_dfmat
+        if not log_dfmat:
+            # See strftime() for the meaning of these directives.
+            # Too loquacious:
+            #    log_dfmat = '%a, %d %b %Y %H:%M:%S'
+            #    E.g., "Mon, 27 Jun 2016 20:39:21"
+            log_dfmat = '%Y-%b-%d|%a|%H:%M:%S'
+        set_(self, 'log_dfmat_', log_dfmat)
+
+        # The fast path only works if the format sticks to My_Record's fields.
+        fields = set(re.findall(r'%\((\w+)\)', log_frmat))
+        set_(self, 'fast_records_', bool(
+            self.log_fast_records and fields.issubset(My_Record.__slots__)
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Log_Config is immutable; use replace()')
+
+    def __delattr__(self, name):
+        raise AttributeError('Log_Config is immutable; use replace()')
+
+    def as_options(self):
+        return dict((name, getattr(self, name)) for name, default in Log_Config.options)
+
+    def replace(self, **changes):
+        """
+        Return a new Log_Config, with the changes.
+        """
+        options = self.as_options()
+        options.update(changes)
+        return Log_Config(**options)
+
+def level_value(level):
+    """
+    Return the level number for a level name, e.g., 'VERBOSE3' (or for
+    a level number, which is just returned).
+    """
+    if isinstance(level, str):
+        try:
+            return level_numbers[level.upper()]
+        except KeyError:
+            pass
+        value = logging.getLevelName(level.upper())
+        if isinstance(value, int):
+            return value
+        try:
+            return int(level)
+        except ValueError:
+            raise ValueError('Unknown log level: %r' % (level,))
+    return level
+
+config = Log_Config()
+config_lock = threading.RLock()
+
+def config_line_format(frmat_len, frmat_postfix, line_len=None, add_tid=False):
+    reconfigure(
+        log_frmat_len=frmat_len,
+        log_frmat_postfix=frmat_postfix,
+        log_line_len=line_len,
+        add_thread_id=add_tid,
+    )
+
+# ***
+
+# Per-logger and per-module level overrides, e.g.,
+#
+#   init_logging(INFO, level_overrides={'db.pool': VERBOSE3, 'http': WARNING})
+#
+# An override applies to the named logger and to its dotted descendants,
+# just like the logging hierarchy. It also applies to calls made from a
+# module of that name (or from a submodule), which is how you'd target
+# the shared '%' logger behind the module-level debug(), info(), etc.
+# If both the logger name and the call-site module match, the longer
+# (more specific) name wins; on a tie, the logger name wins.
+#
+# The resolved levels are memoized in a lookup table keyed by (logger
+# name, call-site module), so the per-call decision is one dict hit.
+# The overrides and their table live in the config, so changing the
+# overrides (i.e., swapping the config) invalidates the table.
+
+# The files whose frames are never the call site: the stdlib logging
+# module, and us.
+_call_site_skip = set([
+    logging.addLevelName.__code__.co_filename,
+    config_line_format.__code__.co_filename,
+])
+
+def _call_site_frame():
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_filename not in _call_site_skip:
+            return frame
+        frame = frame.f_back
+    return None
+
+# Memoize the module and func names per code object, to avoid the
+# path munging on every record.
+_call_site_names = {}
+
+def _call_site():
+    """
+    Return the (module, funcName, lineno) of the caller who's logging.
+    """
+    frame = _call_site_frame()
+    if frame is None:
+        return None
+    code = frame.f_code
+    try:
+        mod, func = _call_site_names[code]
+    except KeyError:
+        mod = os.path.splitext(os.path.basename(code.co_filename))[0]
+        func = code.co_name
+        _call_site_names[code] = (mod, func)
+    return (mod, func, frame.f_lineno)
+
+def _resolve_level_override(overrides, logger_name, mod_name):
+    best_len = -1
+    best_level = None
+    for name in (logger_name, mod_name):
+        while name:
+            if name in overrides:
+                if len(name) > best_len:
+                    best_len = len(name)
+                    best_level = overrides[name]
+                break
+            name = name.rpartition('.')[0]
+    return best_level
+
+def set_level_overrides(overrides):
+    """
+    Replace all level overrides, e.g., {'db.pool': VERBOSE3, 'http': WARNING}.
+    Pass None or {} to clear them.
+    """
+    reconfigure(level_overrides=overrides)
+
+def set_level_override(name, log_level):
+    """
+    Add (or change) the level override for one logger or module name.
+    Use a log_level of None to remove the override.
+    """
+    with config_lock:
+        overrides = dict(config.level_overrides)
+        if log_level is None:
+            overrides.pop(name, None)
+        else:
+            overrides[name] = log_level
+        set_level_overrides(overrides)
+
+def clear_level_overrides():
+    set_level_overrides(None)
+
+# ***
+
 if sys.version_info.major == 2:
     make_string = lambda s: unicode(s)
 else:
     make_string = lambda s: str(s)
 
+# A lightweight record, for My_Logger's fast path (init_logging's
+# log_fast_records). A LogRecord builds a __dict__ of 20-some attributes
+# (and My_Logger._log's stack walk, findCaller, is wasted on us, since
+# My_Handler.format finds the call site, anyway). My_Record only has the
+# fields our formats use, and it's converted to a real LogRecord just
+# for the handlers that aren't ours (see accepts_fast_records).
+
+class My_Record(object):
+
+    __slots__ = (
+        'name',
+        'msg',
+        'args',
+        'levelno',
+        'levelname',
+        'created',
+        'msecs',
+        'thread',
+        'module',
+        'funcName',
+        'lineno',
+        'exc_info',
+        'exc_text',
+        'stack_info',
+        # Set by Formatter.format.
+        'message',
+        'asctime',
+        # See _rendered_local.
+        '__weakref__',
+    )
+
+    def __init__(self, name, level, msg, args, exc_info):
+        self.name = name
+        self.levelno = level
+        self.levelname = logging.getLevelName(level)
+        self.msg = msg
+        # Same as LogRecord: log.debug('%(a)s', {'a': 1}).
+        if (
+            args
+            and len(args) == 1
+            and isinstance(args[0], dict)
+            and args[0]
+        ):
+            args = args[0]
+        self.args = args
+        created = time.time()
+        self.created = created
+        self.msecs = (created - int(created)) * 1000
+        self.thread = _get_ident()
+        self.module = None
+        self.funcName = None
+        self.lineno = 0
+        self.exc_info = exc_info
+        self.exc_text = None
+        self.stack_info = None
+
+    def getMessage(self):
+        msg = str(self.msg)
+        if self.args:
+            msg = msg % self.args
+        return msg
+
+    # Formatter's %-style formats 'fmt % record.__dict__', and all it
+    # needs is a mapping, so we're our own __dict__.
+    @property
+    def __dict__(self):
+        return self
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def to_log_record(self):
+        """
+        Make a real LogRecord, e.g., for a third-party handler.
+        """
+        frame = _call_site_frame()
+        if frame is not None:
+            pathname = frame.f_code.co_filename
+            lineno = frame.f_lineno
+            func = frame.f_code.co_name
+        else:
+            pathname, lineno, func = '(unknown file)', 0, '(unknown function)'
+        record = logging.LogRecord(
+            self.name,
+            self.levelno,
+            pathname,
+            lineno,
+            self.msg,
+            None,
+            self.exc_info,
+            func,
+        )
+        # Not passed to LogRecord, which would unwrap a dict arg again.
+        record.args = self.args
+        record.created = self.created
+        record.msecs = self.msecs
+        record.relativeCreated = (self.created - logging._startTime) * 1000
+        record.exc_text = self.exc_text
+        return record
+
+try:
+    _get_ident = threading.get_ident
+except AttributeError:
+    # Python 2.
+    import thread as _thread
+    _get_ident = _thread.get_ident
+
 class My_Logger(logging.Logger):
 
     def __init__(self, name, level=logging.NOTSET):
         logging.Logger.__init__(self, name, level)
 
+    def _is_enabled_for(self, level):
+        """
+        Is this logger enabled for level 'level'?
+
+        Same as logging.Logger.isEnabledFor, unless there are level
+        overrides, in which case the precomputed override for this
+        logger and the call-site module (if any) decides. And under
+        backpressure, the levels being shed are disabled, regardless.
+        """
+        if level < shed_level:
+            controller = backpressure
+            if controller is not None:
+                controller.count_shed(level)
+            return False
+        cfg = config
+        overrides = cfg.level_overrides
+        if not overrides:
+            return logging.Logger.isEnabledFor(self, level)
+        if getattr(self, 'disabled', False):
+            return False
+        if self.manager.disable >= level:
+            return False
+        frame = _call_site_frame()
+        mod_name = frame.f_globals.get('__name__') if frame is not None else None
+        key = (self.name, mod_name)
+        try:
+            override = cfg.override_lookup[key]
+        except KeyError:
+            override = _resolve_level_override(overrides, self.name, mod_name)
+            cfg.override_lookup[key] = override
+        if override is None:
+            return level >= self.getEffectiveLevel()
+        return level >= override
+
+    # (The profiler swaps in its own, see config_log_profiler.)
+    isEnabledFor = _is_enabled_for
+
     # C.f., e.g., /usr/lib64/python2.7/logging/__init__.py
 
-    def _log(self, level, msg, args, exc_info=None, extra=None):
+    def _log(self, level, msg, args, exc_info=None, extra=None, **kwargs):
         global APACHE_REQUEST
-        global include_thread_id
-        global show_logger_name_
-        global show_mod_func_line_
+        cfg = config
         # For multi-threaded apps, including the thread ID.
-        if include_thread_id:
+        if cfg.include_thread_id:
             # FIXME/MAYBE: Use Formatter's %(thread)s.
             if APACHE_REQUEST is not None:
                 # You'll see the same parent process ID (and it's not 1)
@@ -268,7 +799,7 @@ class My_Logger(logging.Logger):
             else:
                 msg = '%8d: %s' % (threading.currentThread().ident, msg,)
 #
-        if False and show_mod_func_line_:
+        if False and cfg.show_mod_func_line_:
             # Grab the frame so we can spit the fcn., file, and line number.
             # (We cannot use Formatter's %()s options because wrappered.)
             frame = inspect.currentframe().f_back
@@ -281,7 +812,71 @@ class My_Logger(logging.Logger):
             ##template.substitute({'mod_func_line': mod_func_line,})
             #msg = msg.replace('${mod_func_line}', mod_func_line)
             msg = '%s # %s' % (mod_func_line, msg,)
-        logging.Logger._log(self, level, msg, args, exc_info, extra)
+        buffers = thread_buffers
+        if buffers is not None:
+            # Tell the drainer that this thread has a record in the works
+            # (see Thread_Buffers), from before the record's timestamp.
+            buffer = buffers.buffer()
+            busy_since = buffer.busy_since
+            buffer.busy_since = time.time()
+        controller = backpressure
+        timing = controller is not None and controller.count_record()
+        if timing:
+            start = time.time()
+        prof = log_profiler
+        try:
+            if prof is not None:
+                prof.dispatch(self, cfg, level, msg, args, exc_info, extra, kwargs)
+            else:
+                self._dispatch(cfg, level, msg, args, exc_info, extra, kwargs)
+        finally:
+            if buffers is not None:
+                buffer.busy_since = busy_since
+            if timing:
+                controller.add_latency(time.time() - start)
+
+    def _dispatch(self, cfg, level, msg, args, exc_info, extra, kwargs):
+        if cfg.fast_records_ and extra is None and not kwargs and not self.filters:
+            self._log_fast(level, msg, args, exc_info)
+        else:
+            logging.Logger._log(self, level, msg, args, exc_info, extra, **kwargs)
+
+    def _log_fast(self, level, msg, args, exc_info):
+        # C.f. logging.Logger._log, handle, and callHandlers, sans
+        # findCaller, and with a My_Record.
+        if exc_info:
+            if isinstance(exc_info, BaseException):
+                exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+            elif not isinstance(exc_info, tuple):
+                exc_info = sys.exc_info()
+        if getattr(self, 'disabled', False):
+            return
+        record = My_Record(self.name, level, msg, args, exc_info)
+        log_record = None
+        found = 0
+        logger = self
+        while logger:
+            for handler in logger.handlers:
+                found += 1
+                if level >= handler.level:
+                    # A handler's filters get a LogRecord, like anyone's
+                    # would (e.g., a filter might add an attribute).
+                    if (
+                        getattr(handler, 'accepts_fast_records', False)
+                        and not handler.filters
+                    ):
+                        handler.handle(record)
+                    else:
+                        if log_record is None:
+                            log_record = record.to_log_record()
+                        handler.handle(log_record)
+            if not logger.propagate:
+                break
+            logger = logger.parent
+        if found == 0:
+            last_resort = getattr(logging, 'lastResort', None)
+            if last_resort is not None and level >= last_resort.level:
+                last_resort.handle(record.to_log_record())
 
     # NOTE: Old source used apply, which is deprecated. E.g.,:
     #         apply(self._log, (NOTICE, msg, args), kwargs)
@@ -359,29 +954,179 @@ class My_Logger(logging.Logger):
         if self.isEnabledFor(FATAL):
             self._log(FATAL, msg, args, **kwargs)
 
+# ***
+
+# Traceback rendering cache, e.g., for when a failing dependency raises
+# the same exception thousands of times, and each error(..., exc_info=True)
+# would otherwise re-render (and re-log) the same traceback.
+#
+# The cache is keyed by the exception type and the code and line of each
+# of its frames (and those of any chained cause, and the cause's message),
+# and it keeps the rendered stack, so a repeat only renders the last line
+# (the exception message, which often differs). With dedupe
+# on, a repeat is logged as one line, referring back to the first, e.g.,
+#
+#   Traceback #3:
+#   Traceback (most recent call last):
+#     ...
+#   ValueError: Cannot connect.
+#
+#   Cannot connect. Same traceback as #3 (17 times): ValueError: Cannot connect.
+#
+# (My_Formatter puts the reference on the message line, rather than after
+# a newline, as logging.Formatter would, so the record is wrapped like any
+# other one-line message, and not printed verbatim.)
+
+class Traceback_Cache(object):
+
+    def __init__(self, max_size=256, dedupe=False):
+        self.max_size = max_size
+        self.dedupe = dedupe
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # key -> [id, count, stack text or None]
+        self.entries = collections.OrderedDict()
+        self.next_id = 1
+
+    @staticmethod
+    def key(etype, value, tb):
+        frames = []
+        while tb is not None:
+            frames.append((tb.tb_frame.f_code, tb.tb_lineno, tb.tb_lasti))
+            tb = tb.tb_next
+        key = (etype, tuple(frames))
+        # A chained exception renders its cause (or context), too.
+        cause = getattr(value, '__cause__', None)
+        if cause is None and not getattr(value, '__suppress_context__', False):
+            cause = getattr(value, '__context__', None)
+        if cause is not None:
+            # The cached stack includes the cause's message, so it's part
+            # of the key, too (but the last exception's message is not).
+            key += (
+                Traceback_Cache.key(
+                    type(cause), cause, getattr(cause, '__traceback__', None),
+                ),
+                ''.join(traceback.format_exception_only(type(cause), cause)),
+            )
+        return key
+
+    def format(self, formatter, ei):
+        etype, value, tb = ei
+        key = Traceback_Cache.key(etype, value, tb)
+        exc_only = ''.join(traceback.format_exception_only(etype, value)).rstrip('\n')
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.pop(key)
+                self.entries[key] = entry
+                entry[1] += 1
+                if self.dedupe:
+                    return 'Same traceback as #%d (%d times): %s' % (
+                        entry[0], entry[1], exc_only.replace('\n', ' '),
+                    )
+                if entry[2] is not None:
+                    return entry[2] + exc_only
+        # Not cached (or not cacheable), so let logging render it.
+        text = logging.Formatter.formatException(formatter, ei)
+        if entry is not None:
+            return text
+        stack = None
+        if text.endswith(exc_only):
+            stack = text[:len(text) - len(exc_only)]
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = [self.next_id, 1, stack]
+                self.next_id += 1
+                self.entries[key] = entry
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        if self.dedupe:
+            text = 'Traceback #%d:\n%s' % (entry[0], text,)
+        return text
+
+traceback_cache = Traceback_Cache()
+
+class My_Formatter(logging.Formatter):
+
+    def format(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        exc_text = record.exc_text
+        if (
+            (not exc_text)
+            or (exc_text.find('\n') != -1)
+            or getattr(record, 'stack_info', None)
+        ):
+            return logging.Formatter.format(self, record)
+        # A one-line exc_text, e.g., a dedupe reference, follows the
+        # message on the same line.
+        exc_info = record.exc_info
+        record.exc_info = None
+        record.exc_text = None
+        try:
+            formatted = logging.Formatter.format(self, record)
+        finally:
+            record.exc_info = exc_info
+            record.exc_text = exc_text
+        return '%s %s' % (formatted, exc_text,)
+
+    def formatException(self, ei):
+        return traceback_cache.format(self, ei)
+
 # *** 
 
 class My_StreamHandler(logging.StreamHandler):
 
+    # See My_Record.
+    accepts_fast_records = True
+
+    # See Line_Layout.
+    layout = None
+
     def __init__(self, stream=None):
         logging.StreamHandler.__init__(self, stream)
 
     def format(self, record):
         return My_Handler.format(self, record)
 
+    def handle(self, record):
+        return My_Handler.handle(self, record)
+
+    def flush(self):
+        My_Handler.flush(self)
+        logging.StreamHandler.flush(self)
+
 class My_FileHandler(logging.FileHandler):
 
+    accepts_fast_records = True
+
+    layout = None
+
     def __init__(self, filename, mode='a'):
         logging.FileHandler.__init__(self, filename, mode)
 
     def format(self, record):
         return My_Handler.format(self, record)
 
+    def handle(self, record):
+        return My_Handler.handle(self, record)
+
+    def flush(self):
+        My_Handler.flush(self)
+        logging.FileHandler.flush(self)
+
 # MAYBE: Mehhhhhhhh. 2016-06-27: Untested/could not get basic wxPython test to work
 #                     (it's my first day using wxPython -- ever! -- so I'll worry/care/
 #                     not care about this later since I got normal console working).
 class My_wxPythonHandler(logging.StreamHandler):
 
+    accepts_fast_records = True
+
+    layout = None
+
     def __init__(self, wx_dest=None):
         """
         Initialize handler.
@@ -415,56 +1160,95 @@ class My_wxPythonHandler(logging.StreamHandler):
         except:
             self.handleError(record)
 
+# Handlers with the same layout and formatter render a record just once.
+# The renderings are kept here, per thread, for the record being logged,
+# and not on the record, which might get pickled (e.g., by SocketHandler,
+# or for a multiprocessing queue), or dumped as JSON. They only keep a
+# weak reference to the record, so as not to keep it (and its traceback,
+# and every frame's locals) alive, whichever logger logged it.
+_rendered_local = threading.local()
+
 class My_Handler(object):
 
+    @staticmethod
+    def handle(handler, record):
+        """
+        Same as logging.Handler.handle, unless init_logging's
+        log_thread_buffers, in which case see Thread_Buffers.
+        """
+        buffers = thread_buffers
+        if buffers is None:
+            return logging.Handler.handle(handler, record)
+        return buffers.handle(handler, record)
+
+    @staticmethod
+    def flush(handler):
+        buffers = thread_buffers
+        if buffers is not None:
+            buffers.drain(final=True)
+
     @staticmethod
     def format(handler, record):
         """
         Format the specified record. If a formatter is set, use it.
         Otherwise, use the default formatter for the module.
         """
-        global msg_continuation_prefix
-        global line_len_log
-        global line_len_msg
+        prof = log_profiler
+        if prof is not None:
+            return prof.format(handler, record)
+        return My_Handler.format_impl(handler, record)
+
+    @staticmethod
+    def layout_of(handler):
+        return getattr(handler, 'layout', None) or config.layout
 
+    @staticmethod
+    def format_impl(handler, record):
         if handler.formatter:
             fmt = handler.formatter
         else:
             fmt = logging._defaultFormatter
 
-        if False:
-            # I cannot get inspect to work as expected.
-            # Grab the frame so we can spit the fcn., file, and line number.
-            # (We cannot use Formatter's %()s options because wrappered.)
-            frame = inspect.currentframe().f_back
-            #frame = frame.f_back
-            mod = make_string(inspect.getmodulename(frame.f_code.co_filename))
-            func = frame.f_code.co_name + '()'
-            linen = make_string(frame.f_lineno)
-            #mod_func_line = '%s.%s:%s' % (mod, func, linen)
-        else:
-            stack = traceback.extract_stack()
-            target_frame = None
-            for frame in stack:
-                # __name__ is, e.g., 'retrosoft.logging2'
-                pathname = __name__.replace('.', os.path.sep) + '.py'
-                if frame[0].endswith(pathname):
-                    break
-                target_frame = frame
-            if target_frame is not None:
-                mod = os.path.splitext(os.path.basename(target_frame[0]))[0]
-                func = target_frame[2]
-                linen = target_frame[1]
-            # else, MAYBE: complain?
-        #
+        # Handlers with the same layout and formatter render it just once.
+        layout = My_Handler.layout_of(handler)
+        local = _rendered_local
+        rendered = None
+        record_ref = getattr(local, 'record_ref', None)
+        if record_ref is not None and record_ref() is record:
+            rendered = local.rendered
+            try:
+                return rendered[(layout, fmt)]
+            except KeyError:
+                pass
+
+        # We cannot use Formatter's %()s options because wrappered, i.e.,
+        # logging's findCaller finds us, not the caller, so find the
+        # first frame that's neither logging's nor ours.
         # HACK!!
-        try:
-            record.module = mod
-            record.funcName = func
-            record.lineno = linen
-        except NameError:
-            pass
+        site = _call_site()
+        if site is not None:
+            record.module, record.funcName, record.lineno = site
+        # else, MAYBE: complain?
+
+        formatted = layout.render(fmt, record)
+        if rendered is None:
+            try:
+                local.record_ref = weakref.ref(record)
+            except TypeError:
+                # Can't be weakly referenced, so don't share it.
+                local.record_ref = None
+                return formatted
+            local.rendered = {(layout, fmt): formatted}
+        else:
+            rendered[(layout, fmt)] = formatted
+        return formatted
 
+    @staticmethod
+    def render(fmt, record, line_len_log, line_len_msg, msg_continuation_prefix):
+        """
+        Format the record, which already knows its call site, and wrap
+        the result. (The binary log renderer calls this directly.)
+        """
         # Fix problem is message is unicode:
         #     File "/usr/lib/python2.7/logging/__init__.py", line 467, in format
         #       s = self._fmt % record.__dict__
@@ -511,9 +1295,264 @@ class My_Handler(object):
 
 # *** 
 
+# Per-thread buffers, i.e., init_logging(log_thread_buffers=True).
+#
+# Normally, each handler's lock is held while it formats the record and
+# writes it, so threads that log a lot serialize on it. With thread
+# buffers, My_StreamHandler and My_FileHandler format the record in the
+# logging thread, holding no lock, and append the text to that thread's
+# own buffer (a deque, which needs no lock to append, or to pop from the
+# other end). A single drainer thread collects the buffers, merges the
+# entries by timestamp, and writes them, holding each handler's lock
+# just for the writes.
+#
+# The drainer holds back the entries that a thread that's slow to append
+# (e.g., it was formatting a traceback, or it lost the GIL) might still
+# need to go after: My_Logger marks each thread's buffer with when it
+# started logging (busy_since), and the drainer only writes entries older
+# than every mark. Records from other loggers aren't marked, so the
+# drainer also holds back entries younger than merge_window. If a thread's
+# buffer fills up (max_buffered), that thread drains them itself, which
+# throttles it, and might write a few entries out of order.
+#
+# Flushing (or closing) a handler drains all the buffers. And note that
+# the logging calls return before the records are written: if the
+# process is killed, the last merge_window's worth is lost.
+
+class Thread_Buffer(object):
+
+    __slots__ = ('entries', 'thread', 'index', 'seq', 'busy_since')
+
+    def __init__(self, thread, index):
+        self.entries = collections.deque()
+        self.thread = thread
+        self.index = index
+        self.seq = 0
+        self.busy_since = None
+
+class Thread_Buffers(object):
+
+    def __init__(self, interval=0.02, merge_window=0.05, max_buffered=10000):
+        self.interval = interval
+        self.merge_window = merge_window
+        self.max_buffered = max_buffered
+        self.local = threading.local()
+        self.buffers = []
+        self.buffers_lock = threading.Lock()
+        self.buffer_count = 0
+        # Entries taken from the buffers, but not written yet, sorted.
+        self.pending = []
+        # Held while draining, i.e., by one drainer at a time, so that
+        # the writes are in order. Never held while waiting on a lock.
+        self.drain_lock = threading.Lock()
+        self.stopped = False
+        self.wakeup = threading.Event()
+        self.drainer = threading.Thread(
+            target=self._run, name='pyoiler_logging-drainer',
+        )
+        self.drainer.daemon = True
+        self.drainer.start()
+
+    def buffer(self):
+        try:
+            return self.local.buffer
+        except AttributeError:
+            pass
+        with self.buffers_lock:
+            buffer = Thread_Buffer(threading.current_thread(), self.buffer_count)
+            self.buffer_count += 1
+            self.buffers.append(buffer)
+        self.local.buffer = buffer
+        return buffer
+
+    def handle(self, handler, record):
+        # C.f. logging.Handler.handle, but no lock, and no emit.
+        rv = handler.filter(record)
+        if rv:
+            try:
+                text = handler.format(record)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                handler.handleError(record)
+                return rv
+            buffer = self.buffer()
+            buffer.seq += 1
+            entries = buffer.entries
+            # (The first three are unique, so sorting stops there.)
+            entries.append(
+                (record.created, buffer.index, buffer.seq, handler, text, record)
+            )
+            if self.stopped or len(entries) >= self.max_buffered:
+                self.drain(final=True)
+        return rv
+
+    def drain(self, final=False):
+        """
+        Write what's buffered, except (unless final) what's younger than
+        merge_window. Returns True if it's all written.
+        """
+        for attempt in range(100):
+            with self.drain_lock:
+                written = self._drain(final)
+            if written or not final:
+                break
+            # A handler lock was busy. Let its holder finish (or, if it's
+            # waiting on us, give up, and leave it to the drainer).
+            time.sleep(0.001)
+        return written
+
+    def _drain(self, final):
+        pending = self.pending
+        with self.buffers_lock:
+            buffers = list(self.buffers)
+        # Read the marks before taking the entries: a thread that's not
+        # busy now either already appended, or will log something newer.
+        cutoff = time.time() - self.merge_window
+        for buffer in buffers:
+            busy_since = buffer.busy_since
+            if busy_since is not None and busy_since < cutoff:
+                cutoff = busy_since
+        taken = False
+        for buffer in buffers:
+            # Ask before taking the entries: a thread that was already
+            # dead cannot append again, but one that dies while we take
+            # them might have appended one last entry after we looked.
+            is_dead = not buffer.thread.is_alive()
+            entries = buffer.entries
+            try:
+                while True:
+                    pending.append(entries.popleft())
+                    taken = True
+            except IndexError:
+                pass
+            if is_dead:
+                with self.buffers_lock:
+                    self.buffers.remove(buffer)
+        if not pending:
+            return True
+        if taken:
+            pending.sort(key=_thread_buffer_key)
+        if final:
+            ready = len(pending)
+        else:
+            ready = 0
+            while ready < len(pending) and pending[ready][0] <= cutoff:
+                ready += 1
+        written = self._write(pending, ready)
+        del pending[:written]
+        return not pending
+
+    @staticmethod
+    def _write(entries, count):
+        """
+        Write the first count entries, and return how many got written.
+
+        Each run of entries for the same handler is written under its
+        lock. But the drainer must never wait on a handler lock (e.g.,
+        logging.shutdown flushes while holding it, and flushing drains),
+        so if a lock is busy, this stops early, and the rest waits.
+        """
+        index = 0
+        flushes = []
+        while index < count:
+            handler = entries[index][3]
+            lock = handler.lock
+            if lock is not None and not lock.acquire(False):
+                break
+            try:
+                stream = getattr(handler, 'stream', None)
+                terminator = getattr(handler, 'terminator', '\n')
+                while index < count and entries[index][3] is handler:
+                    entry = entries[index]
+                    index += 1
+                    if stream is None:
+                        # E.g., closed.
+                        continue
+                    try:
+                        stream.write(entry[4] + terminator)
+                    except (KeyboardInterrupt, SystemExit):
+                        raise
+                    except:
+                        handler.handleError(entry[5])
+                if stream is not None and handler not in flushes:
+                    flushes.append(handler)
+            finally:
+                if lock is not None:
+                    lock.release()
+        for handler in flushes:
+            # The stream's flush, not the handler's (which drains).
+            lock = handler.lock
+            if lock is not None and not lock.acquire(False):
+                continue
+            try:
+                stream = getattr(handler, 'stream', None)
+                if stream is not None and hasattr(stream, 'flush'):
+                    stream.flush()
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                pass
+            finally:
+                if lock is not None:
+                    lock.release()
+        return index
+
+    def _run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.drain()
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                # E.g., handleError raised (logging.raiseExceptions).
+                pass
+
+    def queue_depth(self):
+        with self.buffers_lock:
+            buffers = list(self.buffers)
+        return len(self.pending) + sum(len(buffer.entries) for buffer in buffers)
+
+    def stop(self):
+        """
+        Stop the drainer, and write everything. (Any thread that logs
+        after this drains its own buffer.)
+        """
+        self.stopped = True
+        self.wakeup.set()
+        if self.drainer is not threading.current_thread():
+            self.drainer.join()
+        self.drain(final=True)
+
+def _thread_buffer_key(entry):
+    return entry[:3]
+
+thread_buffers = None
+thread_buffers_at_exit_ = False
+
+def _stop_thread_buffers():
+    global thread_buffers
+    buffers = thread_buffers
+    if buffers is not None:
+        thread_buffers = None
+        buffers.stop()
+
+# *** 
+
 logging_inited = False
 logging_handlers = []
 root_logger = None
+# The formatter that the handlers share (and that new handlers get).
+log_formatter = None
+# The handler for each sink, keyed by sink, e.g., ('file', log_fname).
+handler_sinks = {}
+# The config from init_logging, i.e., before reconfigure_from_file.
+init_config_ = None
+
+# Calling init_logging again reconfigures logging, i.e., it swaps in a
+# new config, and adds (and removes) handlers for the sinks that changed.
 
 def init_logging(
     log_level=logging.INFO, 
@@ -531,27 +1570,47 @@ def init_logging(
     add_thread_id=False,
     show_logger_name=False,
     show_mod_func_line=False,
+    level_overrides=None,
+    log_bin_fname=None,
+    dedupe_tracebacks=False,
+    log_to_syslog=None,
+    log_syslog_transport=None,
+    log_to_socket=None,
+    log_fast_records=False,
+    log_thread_buffers=False,
+    log_zip_fname=None,
+    log_zip_codec='gzip',
+    log_layouts=None,
+    log_backpressure=None,
 ):
-    global logging_inited
-    if not logging_inited:
-        init_logging_impl(
-            log_level,
-            log_fname,
-            log_frmat,
-            log_dfmat,
-            log_to_file,
-            log_to_console,
-            log_to_stderr,
-            log_to_wx,
-            log_frmat_len,
-            log_frmat_postfix,
-            log_line_len,
-            add_thread_id,
-            show_logger_name,
-            show_mod_func_line,
-        )
-        logging_inited = True
-    # else, MAYBE: complain? warn-tell user?
+    init_logging_impl(
+        log_level,
+        log_fname,
+        log_frmat,
+        log_dfmat,
+        log_to_file,
+        log_to_console,
+        log_to_stderr,
+        log_to_wx,
+        log_frmat_len,
+        log_frmat_postfix,
+        log_line_len,
+        add_thread_id,
+        show_logger_name,
+        show_mod_func_line,
+        level_overrides,
+        log_bin_fname,
+        dedupe_tracebacks,
+        log_to_syslog,
+        log_syslog_transport,
+        log_to_socket,
+        log_fast_records,
+        log_thread_buffers,
+        log_zip_fname,
+        log_zip_codec,
+        log_layouts,
+        log_backpressure,
+    )
 
 def init_logging_impl(
     log_level,
@@ -568,83 +1627,210 @@ def init_logging_impl(
     add_thread_id,
     show_logger_name,
     show_mod_func_line,
+    level_overrides,
+    log_bin_fname,
+    dedupe_tracebacks,
+    log_to_syslog=None,
+    log_syslog_transport=None,
+    log_to_socket=None,
+    log_fast_records=False,
+    log_thread_buffers=False,
+    log_zip_fname=None,
+    log_zip_codec='gzip',
+    log_layouts=None,
+    log_backpressure=None,
 ):
-    global include_thread_id
-    global show_logger_name_
-    global show_mod_func_line_
-
-    config_line_format(
-        log_frmat_len,
-        log_frmat_postfix,
-        log_line_len, 
-        add_thread_id,
-    )
-
-    if (not show_logger_name) and (not show_mod_func_line):
-        show_mod_func_line = True
-    show_logger_name_ = show_logger_name
-    show_mod_func_line_ = show_mod_func_line
-
-    if not log_frmat:
-        # See class Formatter in /usr/lib/python2.7/logging/__init__.py for options.
-        #
-        # NOTE: Skipping:
-        #
-        #   %(asctime)s -- Textual time when the LogRecord was created
-        #                   See: log_dfmat (next!)
-        #   %(created)s -- time.time() when LogRecord was created
-        #   %(msecs)s   -- silly. just the msec. portion of %(created)s
-        #   %(relativeCreated)s -- since start of logger;
-        #                           could be interesting for niche applications
-        #
-        #   %(module)s   --   We cannot use Formatter's special variables to
-        #   %(funcName)s --    show the fcn. name and line, e.g.,
-        #   %(lineno)s   --     %(module)s.%(funcName)s:%(lineno)s
-        #                --    because that's us! E.g.,
-        #                --     logging2.notice:199
-        # so we'll override log() and mess around there.
-        #
-        log_frmat = (
-            #'%%(asctime)s %%(levelname)-4s %s%s%s %%(message)s'
-            '%%(levelname)-4s|%%(asctime)s|%s%s%s%%(message)s'
-            % (
-                '%(name)-11s ' if show_logger_name_ else '',
-                #'%(name)-11s|' if show_logger_name_ else '',
-                #'${mod_func_line} ' if show_mod_func_line_ else '',
-                #'%(module)s.%(funcName)s:%(lineno)s ' if show_mod_func_line_ else '',
-                '%(module)s.%(funcName)s:%(lineno)s' if show_mod_func_line_ else '',
-                log_frmat_postfix,
-            )
+    global logging_inited
+    global init_config_
+    with config_lock:
+        new_config = Log_Config(
+            log_level=log_level,
+            log_fname=log_fname,
+            log_frmat=log_frmat,
+            log_dfmat=log_dfmat,
+            log_to_file=log_to_file,
+            log_to_console=log_to_console,
+            log_to_stderr=log_to_stderr,
+            log_to_wx=log_to_wx,
+            log_frmat_len=log_frmat_len,
+            log_frmat_postfix=log_frmat_postfix,
+            log_line_len=log_line_len,
+            add_thread_id=add_thread_id,
+            show_logger_name=show_logger_name,
+            show_mod_func_line=show_mod_func_line,
+            level_overrides=level_overrides,
+            log_bin_fname=log_bin_fname,
+            dedupe_tracebacks=dedupe_tracebacks,
+            log_to_syslog=log_to_syslog,
+            log_syslog_transport=log_syslog_transport,
+            log_to_socket=log_to_socket,
+            log_fast_records=log_fast_records,
+            log_thread_buffers=log_thread_buffers,
+            log_zip_fname=log_zip_fname,
+            log_zip_codec=log_zip_codec,
+            log_layouts=log_layouts,
+            log_backpressure=log_backpressure,
         )
+        init_config_ = new_config
+        _apply_config(new_config)
+        logging_inited = True
 
-# FIXME: UNTESTED:
-    if include_thread_id:
-      # FIXME: 2016-06-27: this code is Untested.
-      # FIXME: See My_Logger._log, which maybe doesn't need to use threading.
-      log_frmat = '%%(thread)8d %s' % (log_frmat,)
-
-    if not log_dfmat:
-        # See strftime() for the meaning of these directives.
-        # Too loquacious:
-        #    log_dfmat = '%a, %d %b %Y %H:%M:%S'
-        #    E.g., "Mon, 27 Jun 2016 20:39:21"
-        log_dfmat = '%Y-%b-%d|%a|%H:%M:%S'
-
-    #logging.basicConfig(
-    #   level=log_level,
-    #   filename=log_fname,
-    #   format=log_frmat,
-    #   datefmt=log_dfmat)
-
-    formatter = logging.Formatter(log_frmat, log_dfmat)
-
-    logging.setLoggerClass(My_Logger)
+def reconfigure(**changes):
+    """
+    Swap in a new config, i.e., the current config with the changes,
+    which are init_logging options, e.g., reconfigure(log_line_len=120).
+    """
+    with config_lock:
+        _swap_config(config.replace(**changes))
+
+def _swap_config(new_config):
+    global config
+    if logging_inited:
+        _apply_config(new_config)
+    else:
+        config = new_config
 
+def _apply_config(new_config):
+    global config
     global root_logger
-    root_logger = logging.getLogger('')
+    global log_formatter
 
-    root_logger.setLevel(log_level)
+    old_config = config
 
+    if not logging_inited:
+        logging.setLoggerClass(My_Logger)
+        root_logger = logging.getLogger('')
+        _add_level_names()
+
+    formatter = None
+    if (
+        (log_formatter is None)
+        or (old_config.log_frmat_ != new_config.log_frmat_)
+        or (old_config.log_dfmat_ != new_config.log_dfmat_)
+    ):
+        #logging.basicConfig(
+        #   level=log_level,
+        #   filename=log_fname,
+        #   format=log_frmat,
+        #   datefmt=log_dfmat)
+        formatter = My_Formatter(new_config.log_frmat_, new_config.log_dfmat_)
+        log_formatter = formatter
+    traceback_cache.dedupe = new_config.dedupe_tracebacks
+
+    # The one assignment that the readers see (or don't see yet).
+    config = new_config
+
+    global thread_buffers
+    global thread_buffers_at_exit_
+    if new_config.log_thread_buffers and thread_buffers is None:
+        thread_buffers = Thread_Buffers()
+        if not thread_buffers_at_exit_:
+            # Before logging.shutdown (atexit runs last registered first).
+            import atexit
+            atexit.register(_stop_thread_buffers)
+            thread_buffers_at_exit_ = True
+    elif not new_config.log_thread_buffers and thread_buffers is not None:
+        _stop_thread_buffers()
+
+    sinks = _config_sinks(new_config)
+    handlers = []
+    added = []
+    for sink in sinks:
+        handler = handler_sinks.get(sink)
+        if handler is None:
+            handler = _make_sink_handler(sink)
+            handler.setFormatter(log_formatter)
+            handler_sinks[sink] = handler
+            added.append(handler)
+        elif formatter is not None:
+            handler.setFormatter(formatter)
+        handler.layout = new_config.layouts_.get(sink[0])
+        handlers.append(handler)
+    global logging_handlers
+    logging_handlers[:] = handlers
+    _apply_handler_levels()
+    # Add the new handlers before removing the old, so nothing's missed.
+    for handler in added:
+        root_logger.addHandler(handler)
+    for sink in list(handler_sinks.keys()):
+        if sink not in sinks:
+            handler = handler_sinks.pop(sink)
+            root_logger.removeHandler(handler)
+            handler.close()
+
+    if old_config.log_backpressure != new_config.log_backpressure or (
+        new_config.log_backpressure and backpressure is None
+    ):
+        _start_backpressure(new_config.log_backpressure)
+
+def _config_sinks(cfg):
+    log_to_console = cfg.log_to_console
+    if (True
+        and not cfg.log_to_file
+        and not log_to_console
+        and not cfg.log_to_stderr
+        and not cfg.log_to_wx
+        and not cfg.log_bin_fname
+        and not cfg.log_to_syslog
+        and not cfg.log_to_socket
+        and not cfg.log_zip_fname
+    ):
+      log_to_console = True
+    sinks = []
+    if cfg.log_to_file:
+        assert(cfg.log_fname)
+        sinks.append(('file', cfg.log_fname))
+    if log_to_console:
+        sinks.append(('console',))
+    #if log_to_stdout:
+    #    # Should be same as not specifying stream.
+    #    sinks.append(('stdout',))
+    if cfg.log_to_stderr:
+        sinks.append(('stderr',))
+    if cfg.log_to_wx:
+        sinks.append(('wx',))
+    if cfg.log_bin_fname:
+        sinks.append(('binary', cfg.log_bin_fname))
+    if cfg.log_to_syslog:
+        # A (host, port), or a Unix socket path. (A JSON list is a tuple.)
+        address = cfg.log_to_syslog
+        if isinstance(address, list):
+            address = tuple(address)
+        sinks.append(('syslog', address, cfg.log_syslog_transport))
+    if cfg.log_to_socket:
+        sinks.append(('socket', cfg.log_to_socket))
+    if cfg.log_zip_fname:
+        sinks.append(('compressed', cfg.log_zip_fname, cfg.log_zip_codec))
+    return sinks
+
+def _make_sink_handler(sink):
+    kind = sink[0]
+    if kind == 'file':
+        return My_FileHandler(sink[1])
+    elif kind == 'console':
+        return My_StreamHandler()
+    elif kind == 'stderr':
+        return My_StreamHandler(sys.stderr)
+    elif kind == 'wx':
+        return My_wxPythonHandler()
+    elif kind == 'binary':
+        # Binary, deferred-format log. See binlog.py.
+        from pyoiler_logging.binlog import My_BinaryFileHandler
+        return My_BinaryFileHandler(sink[1])
+    elif kind == 'syslog':
+        # Network sinks. See netsink.py.
+        from pyoiler_logging.netsink import My_SyslogHandler
+        return My_SyslogHandler(address=sink[1], transport=sink[2])
+    elif kind == 'socket':
+        from pyoiler_logging.netsink import My_UnixSocketHandler
+        return My_UnixSocketHandler(sink[1])
+    elif kind == 'compressed':
+        # Compressed, seekable log. See ziplog.py.
+        from pyoiler_logging.ziplog import My_CompressedFileHandler
+        return My_CompressedFileHandler(sink[1], codec=sink[2])
+    raise ValueError('Unknown sink: %r' % (sink,))
+
+def _add_level_names():
     # SYNC_ME: Log levels.
     logging.addLevelName(        FATAL,     'FATL') # 186
     logging.addLevelName(logging.CRITICAL,  'CRIT') # 50
@@ -662,37 +1848,339 @@ def init_logging_impl(
     logging.addLevelName(        VERBOSE5,  'VRB5') # 05
     logging.addLevelName(        VERBOSE,   'VRBS') # 05
 
-    global logging_handlers
-    if (True
-        and not log_to_file
-        and not log_to_console
-        and not log_to_stderr
-        and not log_to_wx
-    ):
-      log_to_console = True
-    if log_to_file:
-        assert(log_fname)
-        logging_handlers.append(My_FileHandler(log_fname))
-    if log_to_console:
-        logging_handlers.append(My_StreamHandler())
-    #if log_to_stdout:
-    #    # Should be same as not specifying stream.
-    #    logging_handlers.append(My_StreamHandler(sys.stdout))
-    if log_to_stderr:
-        logging_handlers.append(My_StreamHandler(sys.stderr))
-    if log_to_wx:
-        logging_handlers.append(My_wxPythonHandler())
-    for handler in logging_handlers:
-        handler.setLevel(log_level)
-        handler.setFormatter(formatter)
-        root_logger.addHandler(handler)
-
 def setLevel(log_level):
-    global root_logger
-    root_logger.setLevel(log_level)
+    reconfigure(log_level=log_level)
+
+def _apply_handler_levels():
+    cfg = config
+    if root_logger is not None:
+        root_logger.setLevel(cfg.log_level)
+    # The loggers decide what gets logged. But the handlers have levels,
+    # too, so lower them to the most verbose override, else the records
+    # let through by an override would just get dropped by the handlers.
+    handler_level = cfg.log_level
+    if cfg.level_overrides:
+        handler_level = min([handler_level] + list(cfg.level_overrides.values()))
     global logging_handlers
     for handler in logging_handlers:
-        handler.setLevel(level=log_level)
+        handler.setLevel(level=handler_level)
+
+# ***
+
+# Live reconfiguration, e.g., on SIGHUP, or when a config file changes.
+#
+# The config file is JSON, with init_logging options, e.g.,
+#
+#   {"log_level": "DEBUG", "log_line_len": 120,
+#    "level_overrides": {"db.pool": "VERBOSE3"}}
+#
+# and the options are applied over what init_logging was called with,
+# i.e., removing an option from the file reverts it to the app's choice.
+
+def reconfigure_from_file(config_path):
+    import json
+    with open(config_path) as config_file:
+        options = json.load(config_file)
+    with config_lock:
+        base_config = init_config_ if init_config_ is not None else config
+        _swap_config(base_config.replace(**options))
+    notice('Reconfigured logging from %s', config_path)
+
+def reload_on_sighup(config_path, watcher=None):
+    """
+    Reconfigure from config_path on SIGHUP. Call from the main thread.
+
+    The signal handler only asks a Config_Watcher (watcher, or a new
+    one that doesn't poll) to reload, and the watcher's thread does it,
+    so a SIGHUP never reconfigures in the middle of a reconfigure (which
+    config_lock, an RLock, would let the main thread do). Returns the
+    watcher.
+    """
+    import signal
+
+    if watcher is None:
+        watcher = Config_Watcher(config_path, interval=None)
+        watcher.start()
+
+    def on_sighup(signum, frame):
+        watcher.request_reload()
+
+    signal.signal(signal.SIGHUP, on_sighup)
+    return watcher
+
+class Config_Watcher(threading.Thread):
+    """
+    A daemon thread that reconfigures from config_path when it changes
+    (checked every interval seconds, unless interval is None), or when
+    asked to (request_reload).
+    """
+
+    def __init__(self, config_path, interval=2.0):
+        threading.Thread.__init__(self, name='pyoiler_logging-config')
+        self.daemon = True
+        self.config_path = config_path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.wakeup = threading.Event()
+        self.reload_requested = False
+        self.last_stat = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size, stat.st_ino)
+
+    def request_reload(self):
+        # Just a flag and a wakeup, so it's safe from a signal handler.
+        self.reload_requested = True
+        self.wakeup.set()
+
+    def reload(self):
+        try:
+            reconfigure_from_file(self.config_path)
+        except Exception as err:
+            error('Cannot reconfigure logging from %s: %s', self.config_path, err)
+
+    def check(self):
+        stat = self._stat()
+        if stat is not None and stat != self.last_stat:
+            self.last_stat = stat
+            self.reload()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if self.stopped.is_set():
+                break
+            if self.reload_requested:
+                self.reload_requested = False
+                self.last_stat = self._stat()
+                self.reload()
+            elif self.interval is not None:
+                self.check()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+def watch_config_file(config_path, interval=2.0):
+    watcher = Config_Watcher(config_path, interval)
+    watcher.start()
+    return watcher
+
+# ***
+
+# Adaptive backpressure, i.e., init_logging(log_backpressure={...}).
+#
+# A controller thread checks, every interval, how much logging is going
+# on: records/sec, the average time to log a record (sampled), and how
+# many records are queued (in the thread buffers and network spools).
+# If any is over its budget, it sheds a level: first VERBOSE*, then
+# DEBUG, then TRACE (i.e., it never drops INFO, nor WARNING and above).
+# Once everything's under restore_ratio of its budget for restore_after
+# intervals in a row, counting the records that are being shed but that
+# restoring a level would let through (i.e., the demand, not just what's
+# being logged), it restores a level, until it's back to whatever
+# init_logging, setLevel, and the level overrides say. It logs a NOTICE
+# each time it changes.
+#
+# The shed levels are checked first thing in My_Logger.isEnabledFor, so
+# shed records cost about the same as disabled ones.
+
+# Records below shed_level are dropped. 0 means nothing is shed.
+shed_level = 0
+
+# The levels to shed, in order: records below each are dropped.
+SHED_LEVELS = (DEBUG, TRACE, INFO)
+
+class Backpressure_Controller(threading.Thread):
+
+    # Time every Nth record (a power of 2), for the latency.
+    sample_every = 16
+
+    def __init__(
+        self,
+        max_records_per_sec=None,
+        max_emit_ms=None,
+        max_queue_depth=None,
+        interval=1.0,
+        restore_ratio=0.5,
+        restore_after=3,
+    ):
+        threading.Thread.__init__(self, name='pyoiler_logging-backpressure')
+        self.daemon = True
+        self.max_records_per_sec = max_records_per_sec
+        self.max_emit_ms = max_emit_ms
+        self.max_queue_depth = max_queue_depth
+        self.interval = interval
+        self.restore_ratio = restore_ratio
+        self.restore_after = restore_after
+        self.stopped = threading.Event()
+        # NOTE: Not locked, so threads might undercount, which is fine.
+        self.records = 0
+        # The records shed, by level.
+        self.shed = {}
+        self.latency_total = 0.0
+        self.latency_count = 0
+        self.last_records = 0
+        self.last_check = time.time()
+        self.step = 0
+        self.calm = 0
+
+    def count_record(self):
+        """Count a record, and say whether to time it."""
+        self.records += 1
+        return not (self.records & (self.sample_every - 1))
+
+    def count_shed(self, level):
+        shed = self.shed
+        shed[level] = shed.get(level, 0) + 1
+
+    def add_latency(self, elapsed):
+        self.latency_total += elapsed
+        self.latency_count += 1
+
+    def measure(self):
+        """
+        Return (records/sec, average ms per record, queue depth, and
+        {level: records shed/sec}) since the last measure.
+        """
+        now = time.time()
+        records = self.records
+        elapsed = max(now - self.last_check, 1e-6)
+        rate = (records - self.last_records) / elapsed
+        shed, self.shed = self.shed, {}
+        shed_rates = dict((level, count / elapsed) for level, count in shed.items())
+        self.last_records = records
+        self.last_check = now
+        latency_total, latency_count = self.latency_total, self.latency_count
+        self.latency_total = 0.0
+        self.latency_count = 0
+        emit_ms = (latency_total / latency_count * 1000) if latency_count else 0.0
+        depth = 0
+        buffers = thread_buffers
+        if buffers is not None:
+            depth += buffers.queue_depth()
+        for handler in list(logging_handlers):
+            queue_depth = getattr(handler, 'queue_depth', None)
+            if queue_depth is not None:
+                depth += queue_depth()
+        return rate, emit_ms, depth, shed_rates
+
+    def load(self, rate, emit_ms, depth):
+        """
+        Return the highest ratio of a measure to its budget.
+        """
+        ratios = [0.0]
+        for value, budget in (
+            (rate, self.max_records_per_sec),
+            (emit_ms, self.max_emit_ms),
+            (depth, self.max_queue_depth),
+        ):
+            if budget:
+                ratios.append(value / float(budget))
+        return max(ratios)
+
+    def levels(self):
+        """
+        The SHED_LEVELS that'd drop something, given the config.
+        """
+        cfg = config
+        floor = min([cfg.log_level] + list(cfg.level_overrides.values()))
+        return [level for level in SHED_LEVELS if level > floor]
+
+    def update(self, rate, emit_ms, depth, shed_rates=None):
+        """
+        Shed (or restore) a level, given the measures.
+        """
+        global shed_level
+        load = self.load(rate, emit_ms, depth)
+        levels = self.levels()
+        step = min(self.step, len(levels))
+        # What's shed isn't logged, so the rate drops once shedding
+        # starts. Judge a restore by the demand, i.e., also count what
+        # restoring a level would let through again.
+        demand = load
+        if step:
+            floor = levels[step - 2] if step > 1 else 0
+            readmitted = sum(
+                shed_rate for level, shed_rate in (shed_rates or {}).items()
+                if level >= floor
+            )
+            demand = self.load(rate + readmitted, emit_ms, depth)
+        if load > 1.0:
+            self.calm = 0
+            if step < len(levels):
+                step += 1
+        elif demand < self.restore_ratio:
+            self.calm += 1
+            if step and self.calm >= self.restore_after:
+                step -= 1
+                self.calm = 0
+        else:
+            self.calm = 0
+        if step == self.step:
+            return
+        self.step = step
+        shed_level = levels[step - 1] if step else 0
+        measures = '%.0f records/sec, %.3f ms/record, %d queued' % (rate, emit_ms, depth)
+        if shed_level:
+            _notice_always(
+                'Logging backpressure (%s): dropping records below %s',
+                measures,
+                logging.getLevelName(shed_level),
+            )
+        else:
+            _notice_always(
+                'Logging backpressure is over (%s): dropping nothing', measures,
+            )
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.update(*self.measure())
+            except Exception as err:
+                error('Logging backpressure failed: %s', err)
+
+    def stop(self):
+        global shed_level
+        self.stopped.set()
+        if self.step:
+            self.step = 0
+            shed_level = 0
+            _notice_always('Logging backpressure is off: dropping nothing')
+
+def _notice_always(msg, *args):
+    # The notices that say records are being dropped must not be dropped
+    # themselves, e.g., with log_level WARNING, and a verbose override.
+    # So skip the logger's level (and shed_level), and our handlers'. But
+    # not the levels of anyone else's handlers (e.g., an ERROR-level
+    # alerting handler doesn't want these).
+    logger = logging.getLogger('%')
+    record = logger.makeRecord(
+        logger.name, NOTICE, '(unknown file)', 0, msg, args, None,
+    )
+    ours = list(logging_handlers)
+    root = root_logger or logging.getLogger('')
+    for handler in list(root.handlers):
+        if handler in ours or record.levelno >= handler.level:
+            handler.handle(record)
+
+backpressure = None
+
+def _start_backpressure(budgets):
+    global backpressure
+    controller = backpressure
+    backpressure = None
+    if controller is not None:
+        controller.stop()
+    if budgets:
+        controller = Backpressure_Controller(**budgets)
+        controller.start()
+        backpressure = controller
 
 # ***
 
@@ -753,34 +2241,580 @@ def verbose(*args, **kwargs):
 
 # ***
 
+# Timing spans, e.g.,
+#
+#   with timed('load config'):
+#       ...
+#
+#   @timed
+#   def handle_request(req):
+#       ...
+#
+# logs, at TRACE (or whatever level= says), e.g.,
+#
+#   TRCE|...|app.main:42| timed: load config: 1.234 ms [span 7 < 3]
+#
+# where [span 7 < 3] says span 7 ran inside span 3 (in the same thread;
+# a top-level span's parent is 0). The name defaults to the decorated
+# function, or to the with statement's call site.
+#
+# If the level is disabled, a span reads no clock and formats nothing,
+# unless it aggregates (aggregate=True), in which case it's always
+# timed, and its count, total, and percentiles are kept under its name
+# (see timed_report).
+
+try:
+    _span_clock_ns = time.perf_counter_ns
+except AttributeError:
+    try:
+        _span_clock = time.perf_counter
+    except AttributeError:
+        # Python 2.
+        _span_clock = time.time
+    _span_clock_ns = lambda: int(_span_clock() * 1e9)
+
+_span_ids = itertools.count(1)
+_span_local = threading.local()
+
+def _span_logger(logger):
+    if logger is None:
+        return logging.getLogger('%')
+    if not isinstance(logger, logging.Logger):
+        return logging.getLogger(logger)
+    return logger
+
+class Timed_Span(object):
+    """
+    See timed().
+    """
+
+    __slots__ = (
+        'name',
+        'level',
+        'logger',
+        'aggregate',
+        'logging',
+        'span_logger',
+        'span_id',
+        'parent_id',
+        'start',
+    )
+
+    def __init__(self, name=None, level=TRACE, logger=None, aggregate=False):
+        self.name = name
+        self.level = level
+        self.logger = logger
+        self.aggregate = aggregate
+        self.start = None
+
+    def __enter__(self):
+        # (Not when made, e.g., at import, which might be before
+        # init_logging sets the logger class.)
+        logger = self.span_logger = _span_logger(self.logger)
+        self.logging = logger.isEnabledFor(self.level)
+        if self.logging:
+            try:
+                stack = _span_local.stack
+            except AttributeError:
+                stack = _span_local.stack = []
+            self.parent_id = stack[-1] if stack else 0
+            self.span_id = next(_span_ids)
+            stack.append(self.span_id)
+        elif not self.aggregate:
+            return self
+        self.start = _span_clock_ns()
+        return self
+
+    def __exit__(self, etype, value, tb):
+        start = self.start
+        if start is None:
+            return False
+        elapsed = _span_clock_ns() - start
+        self.start = None
+        name = self.name
+        if name is None:
+            frame = sys._getframe(1)
+            mod = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+            name = '%s.%s:%d' % (mod, frame.f_code.co_name, frame.f_lineno)
+        if self.aggregate:
+            _timed_add(name, elapsed)
+        if self.logging:
+            stack = _span_local.stack
+            if stack and stack[-1] == self.span_id:
+                stack.pop()
+            self.span_logger.log(
+                self.level,
+                'timed: %s: %.3f ms [span %d < %d]',
+                name,
+                elapsed / 1e6,
+                self.span_id,
+                self.parent_id,
+            )
+        return False
+
+    def __call__(self, func):
+        name = self.name
+        if name is None:
+            name = '%s.%s' % (
+                func.__module__,
+                getattr(func, '__qualname__', func.__name__),
+            )
+        level = self.level
+        logger = self.logger
+        aggregate = self.aggregate
+
+        # Find the logger when called, not when decorated (likely at
+        # import, before init_logging sets the logger class). But only
+        # until it's ours: getLogger takes logging's module lock, which
+        # every call, even a disabled one, would otherwise contend for.
+        resolved = [logger if isinstance(logger, logging.Logger) else None]
+
+        @functools.wraps(func)
+        def timed_wrapper(*args, **kwargs):
+            span_logger = resolved[0]
+            if span_logger is None:
+                span_logger = _span_logger(logger)
+                if isinstance(span_logger, My_Logger):
+                    resolved[0] = span_logger
+            if not aggregate and not span_logger.isEnabledFor(level):
+                return func(*args, **kwargs)
+            with Timed_Span(name, level, span_logger, aggregate):
+                return func(*args, **kwargs)
+
+        return timed_wrapper
+
+def timed(name=None, level=TRACE, logger=None, aggregate=False):
+    """
+    Time a block (with timed(...):) or a function (@timed, or
+    @timed(...)), and log how long it took. The logger is a Logger, or
+    a logger name (default: the module-level functions' logger, '%').
+    """
+    if callable(name):
+        # I.e., @timed, without the parentheses.
+        return Timed_Span()(name)
+    return Timed_Span(name, level, logger, aggregate)
+
+# The aggregates, keyed by span name. Each keeps an exact count and
+# total, and a random sample of up to timed_samples durations for the
+# percentiles.
+timed_aggregates = {}
+timed_samples = 4096
+timed_lock = threading.Lock()
+
+def _timed_add(name, elapsed):
+    with timed_lock:
+        try:
+            stats = timed_aggregates[name]
+        except KeyError:
+            stats = timed_aggregates[name] = [0, 0, []]
+        stats[0] += 1
+        stats[1] += elapsed
+        samples = stats[2]
+        if len(samples) < timed_samples:
+            samples.append(elapsed)
+        else:
+            # Reservoir sampling, i.e., each duration is equally likely kept.
+            index = random.randrange(stats[0])
+            if index < timed_samples:
+                samples[index] = elapsed
+
+def _percentile(ordered, fraction):
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+def timed_report(log_it=True):
+    """
+    Return (and log, unless not log_it) the aggregated spans, as
+    (name, count, total ms, mean ms, p50 ms, p99 ms), most total first.
+    """
+    with timed_lock:
+        aggregates = [
+            (name, stats[0], stats[1], sorted(stats[2]))
+            for name, stats in timed_aggregates.items()
+        ]
+    rows = []
+    for name, count, total, ordered in aggregates:
+        rows.append((
+            name,
+            count,
+            total / 1e6,
+            total / 1e6 / count,
+            _percentile(ordered, 0.50) / 1e6,
+            _percentile(ordered, 0.99) / 1e6,
+        ))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    if log_it and rows:
+        lines = ['%10s %12s %10s %10s %10s  %s' % (
+            'count', 'total_ms', 'mean_ms', 'p50_ms', 'p99_ms', 'name',
+        )]
+        for row in rows:
+            lines.append('%10d %12.3f %10.3f %10.3f %10.3f  %s' % (row[1:] + row[:1]))
+        notice('Timed spans:\n%s', '\n'.join(lines))
+    return rows
+
+def timed_reset():
+    with timed_lock:
+        timed_aggregates.clear()
+
+# ***
+
 # A soft assert complains about non-exception-worthy unexpected states.
 # DEV-TIPs: Enable breakpoints easily with assert_soft(False) by setting
 #           ON_ASSERT_TRACE=True environment variable.
 ON_ASSERT_TRACE = False
 #ON_ASSERT_TRACE = True
+
+# Each call site logs its first failure, and then just counts, logging
+# a summary every assert_soft_summary_every failures. Call
+# assert_soft_report() (or config_assert_soft(report_at_exit=True)) to
+# see the totals. The table is keyed by (code, line), and the values
+# are [count, first message].
+assert_soft_failures = {}
+assert_soft_summary_every = 1000
+
+# Resolved once (see config_assert_soft), not on every failure.
+assert_trace_ = bool(ON_ASSERT_TRACE or os.environ.get('ON_ASSERT_TRACE'))
+
 def assert_soft(condition, *args, **kwargs):
     # MAYBE: There's a way to print out the source code for a failed condition
     # and also the value(s) that were used, but [lb] doesn't know it and I don't
     # want to spend time searching. See py.test's asserts for an example.
     # MAYBE: Use logcheck and email the developers when this happens.
     if not condition:
-        if not args:
-            kwargs.setdefault('msg', 'Assertion failed.')
-        fatal(*args, **kwargs)
-        do_break = False
-        if ON_ASSERT_TRACE:
-            do_break = True
-        else:
-            try:
-                do_break = os.environ['ON_ASSERT_TRACE']
-            except KeyError:
-                pass
-        if do_break:
+        frame = sys._getframe(1)
+        key = (frame.f_code, frame.f_lineno)
+        try:
+            failure = assert_soft_failures[key]
+        except KeyError:
+            first_msg = str(args[0]) if args else kwargs.get('msg', 'Assertion failed.')
+            failure = assert_soft_failures.setdefault(key, [0, first_msg])
+        # NOTE: Not locked, so threads might undercount, which is fine.
+        failure[0] += 1
+        if failure[0] == 1:
+            if not args:
+                kwargs.setdefault('msg', 'Assertion failed.')
+            fatal(*args, **kwargs)
+        elif (
+            assert_soft_summary_every
+            and (failure[0] % assert_soft_summary_every) == 0
+        ):
+            fatal('Soft assertion failed %d times: %s', failure[0], failure[1])
+        if assert_trace_:
             if threading.current_thread().name == 'MainThread':
                 import pdb; pdb.set_trace()
             else:
                 import pydevd; pydevd.settrace()
 
+assert_soft_impl_ = assert_soft
+
+def assert_soft_noop(condition, *args, **kwargs):
+    pass
+
+assert_soft_at_exit_ = False
+
+def config_assert_soft(
+    enabled=True,
+    summary_every=None,
+    trace=None,
+    report_at_exit=False,
+):
+    """
+    Configure assert_soft.
+
+    With enabled=False, assert_soft is rebound to a no-op, so a disabled
+    build pays only for the function call. But a module that already
+    imported assert_soft by name keeps the old function, so call this
+    before "from pyoiler_logging import *", or disable it from the start
+    with the ASSERT_SOFT_DISABLED environment variable.
+    """
+    global assert_soft
+    global assert_soft_summary_every
+    global assert_trace_
+    global assert_soft_at_exit_
+    assert_soft = assert_soft_impl_ if enabled else assert_soft_noop
+    if summary_every is not None:
+        assert_soft_summary_every = summary_every
+    if trace is not None:
+        assert_trace_ = trace
+    if report_at_exit and not assert_soft_at_exit_:
+        import atexit
+        atexit.register(assert_soft_report)
+        assert_soft_at_exit_ = True
+
+def assert_soft_report(log_it=True):
+    """
+    Return (and log, unless not log_it) the soft assertion failures, as
+    (count, 'module.func:line', first message), most failures first.
+    """
+    rows = []
+    for (code, lineno), (count, first_msg) in list(assert_soft_failures.items()):
+        mod = os.path.splitext(os.path.basename(code.co_filename))[0]
+        rows.append((count, '%s.%s:%d' % (mod, code.co_name, lineno), first_msg))
+    rows.sort(key=lambda row: row[0], reverse=True)
+    if log_it:
+        for row in rows:
+            warning('Soft assertion failed %d times at %s: %s', *row)
+    return rows
+
+if os.environ.get('ASSERT_SOFT_DISABLED'):
+    config_assert_soft(enabled=False)
+
+# ***
+
+# An opt-in profiler that charges the cost of logging to each call site
+# (i.e., each log statement), split into phases:
+#
+#   level:   the isEnabledFor check (counted even when it says no);
+#   message: rendering 'msg % args' (once per record);
+#   format:  the rest of My_Handler.format (the Formatter, and wrapping);
+#   emit:    everything else, i.e., making the record and the handlers,
+#            less the message and format phases.
+#
+# E.g.,
+#
+#   config_log_profiler(enabled=True)
+#   ...
+#   log_profile_report()               # Log a table, costliest first.
+#   log_profile_dump('logging.prof')   # For python -m pstats logging.prof
+#
+# When the profiler is disabled, My_Logger._log and My_Handler.format
+# each check one global, and isEnabledFor isn't touched at all.
+
+try:
+    _profile_clock = time.perf_counter
+except AttributeError:
+    # Python 2.
+    _profile_clock = time.time
+
+PROFILE_PHASES = ('level', 'message', 'format', 'emit')
+PROFILE_LEVEL, PROFILE_MESSAGE, PROFILE_FORMAT, PROFILE_EMIT = range(4)
+
+def _profile_site():
+    frame = _call_site_frame()
+    if frame is None:
+        return None
+    return (frame.f_code, frame.f_lineno)
+
+def _profile_site_name(site):
+    if site is None:
+        return '(unknown)'
+    code, lineno = site
+    mod = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return '%s.%s:%d' % (mod, code.co_name, lineno)
+
+class Log_Profiler(object):
+
+    def __init__(self):
+        # Keyed by (code, lineno). The values are [count, seconds] per
+        # phase, in PROFILE_PHASES order.
+        self.sites = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def reset(self):
+        with self.lock:
+            self.sites.clear()
+
+    def add(self, site, phase, elapsed):
+        with self.lock:
+            try:
+                costs = self.sites[site]
+            except KeyError:
+                costs = self.sites[site] = [[0, 0.0] for _ in PROFILE_PHASES]
+            cost = costs[phase]
+            cost[0] += 1
+            cost[1] += elapsed
+
+    @staticmethod
+    def is_enabled_for(logger, level):
+        # Swapped in for My_Logger.isEnabledFor, so self is the logger.
+        prof = log_profiler
+        if prof is None:
+            return logger._is_enabled_for(level)
+        site = _profile_site()
+        start = _profile_clock()
+        enabled = logger._is_enabled_for(level)
+        prof.add(site, PROFILE_LEVEL, _profile_clock() - start)
+        return enabled
+
+    def dispatch(self, logger, cfg, level, msg, args, exc_info, extra, kwargs):
+        local = self.local
+        site = _profile_site()
+        local.site = site
+        local.inner = 0.0
+        start = _profile_clock()
+        try:
+            logger._dispatch(cfg, level, msg, args, exc_info, extra, kwargs)
+        finally:
+            elapsed = _profile_clock() - start - local.inner
+            local.site = None
+            local.record = None
+            local.message = None
+            self.add(site, PROFILE_EMIT, elapsed)
+
+    def format(self, handler, record):
+        local = self.local
+        site = getattr(local, 'site', None)
+        if site is None:
+            # E.g., a handler called from a logger that's not ours.
+            site = _profile_site()
+        start = _profile_clock()
+        # Render the message once per record, not once per handler.
+        if getattr(local, 'record', None) is not record:
+            local.record = record
+            local.message = None
+            local.message = record.getMessage()
+            message_time = _profile_clock() - start
+            self.add(site, PROFILE_MESSAGE, message_time)
+        else:
+            message_time = 0.0
+        start = _profile_clock()
+        # Have the Formatter use the rendered message, so the format
+        # phase doesn't pay for it again.
+        msg, args = record.msg, record.args
+        record.msg, record.args = local.message, None
+        try:
+            formatted = My_Handler.format_impl(handler, record)
+        finally:
+            record.msg, record.args = msg, args
+            format_time = _profile_clock() - start
+            self.add(site, PROFILE_FORMAT, format_time)
+            local.inner = getattr(local, 'inner', 0.0) + message_time + format_time
+        return formatted
+
+    def rows(self, sort_by='total'):
+        """
+        Return (site, calls, level, message, format, emit, total) rows,
+        with the times in seconds, sorted descending by sort_by, which is
+        'calls', 'total', or one of the PROFILE_PHASES.
+        """
+        with self.lock:
+            sites = [
+                (site, [list(cost) for cost in costs])
+                for site, costs in self.sites.items()
+            ]
+        rows = []
+        for site, costs in sites:
+            times = [cost[1] for cost in costs]
+            rows.append(tuple(
+                [_profile_site_name(site), max(cost[0] for cost in costs)]
+                + times
+                + [sum(times)]
+            ))
+        columns = ('site', 'calls') + PROFILE_PHASES + ('total',)
+        index = columns.index(sort_by)
+        rows.sort(key=lambda row: row[index], reverse=True)
+        return rows
+
+    def table(self, sort_by='total', limit=None):
+        rows = self.rows(sort_by)
+        if limit:
+            rows = rows[:limit]
+        lines = [
+            '%10s %11s %11s %11s %11s %11s %9s  %s' % (
+                'calls', 'level_us', 'message_us', 'format_us', 'emit_us',
+                'total_us', 'per_call', 'site',
+            )
+        ]
+        for row in rows:
+            site, calls = row[0], row[1]
+            usecs = [secs * 1e6 for secs in row[2:]]
+            lines.append('%10d %11.0f %11.0f %11.0f %11.0f %11.0f %9.2f  %s' % tuple(
+                [calls] + usecs + [usecs[-1] / max(calls, 1), site]
+            ))
+        return lines
+
+    def dump_stats(self, path):
+        """
+        Write a pstats-compatible file, i.e., marshal'ed {func: (cc, nc,
+        tt, ct, callers)}. Each call site is a function, and calls one
+        pseudo-function per phase, e.g.,
+
+          import pstats
+          pstats.Stats('logging.prof').sort_stats('cumulative').print_stats(20)
+          pstats.Stats('logging.prof').print_callees()
+        """
+        import marshal
+        with self.lock:
+            sites = [
+                (site, [list(cost) for cost in costs])
+                for site, costs in self.sites.items()
+            ]
+        stats = {}
+        phase_funcs = [
+            ('~', 0, '<logging %s>' % (phase,)) for phase in PROFILE_PHASES
+        ]
+        phase_stats = [[0, 0.0, {}] for _ in PROFILE_PHASES]
+        for site, costs in sites:
+            if site is None:
+                func = ('~', 0, '<unknown call site>')
+            else:
+                code, lineno = site
+                func = (code.co_filename, lineno, code.co_name)
+            calls = max(cost[0] for cost in costs)
+            total = sum(cost[1] for cost in costs)
+            stats[func] = (calls, calls, 0.0, total, {})
+            for phase, (count, secs) in enumerate(costs):
+                if count:
+                    phase_stat = phase_stats[phase]
+                    phase_stat[0] += count
+                    phase_stat[1] += secs
+                    phase_stat[2][func] = (count, count, secs, secs)
+        for func, (count, secs, callers) in zip(phase_funcs, phase_stats):
+            if count:
+                stats[func] = (count, count, secs, secs, callers)
+        with open(path, 'wb') as stats_f:
+            marshal.dump(stats, stats_f)
+
+# The active profiler (None when disabled), and the one whose costs
+# log_profile_report reports (kept after you disable profiling).
+log_profiler = None
+log_profile_ = None
+log_profile_at_exit_ = False
+
+def config_log_profiler(enabled=True, reset=False, report_at_exit=False):
+    """
+    Start (or stop) profiling the cost of logging per call site. The
+    costs are kept after you stop, unless reset.
+    """
+    global log_profiler
+    global log_profile_
+    global log_profile_at_exit_
+    if reset or log_profile_ is None:
+        log_profile_ = Log_Profiler()
+    if enabled:
+        log_profiler = log_profile_
+        My_Logger.isEnabledFor = Log_Profiler.is_enabled_for
+    else:
+        log_profiler = None
+        My_Logger.isEnabledFor = My_Logger._is_enabled_for
+    if report_at_exit and not log_profile_at_exit_:
+        import atexit
+        atexit.register(log_profile_report)
+        log_profile_at_exit_ = True
+
+def log_profile_report(log_it=True, sort_by='total', limit=25):
+    """
+    Return (and log, unless not log_it) the logging costs per call site,
+    as (site, calls, level, message, format, emit, total) rows, with
+    times in seconds, costliest (per sort_by) first.
+    """
+    if log_profile_ is None:
+        return []
+    rows = log_profile_.rows(sort_by)
+    if log_it:
+        notice(
+            'Logging costs per call site:\n%s',
+            '\n'.join(log_profile_.table(sort_by, limit)),
+        )
+    return rows
+
+def log_profile_dump(path):
+    """
+    Write the logging costs as a pstats file (see Log_Profiler.dump_stats).
+    """
+    if log_profile_ is not None:
+        log_profile_.dump_stats(path)
+
 # *** 
 
 # FIXME: Check that logging is inited in all the calls above?
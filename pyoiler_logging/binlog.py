@@ -0,0 +1,640 @@
+# File: pyoiler_logging/binlog.py
+#  /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+# Author: Landon Bouma (landonb &#x40; retrosoft &#x2E; com)
+# Project: https://github.com/landonb/pyoiler-logging
+# Summary: Binary, deferred-format log files, and their offline renderer.
+# License: GPLv3. See LICENSE.txt.
+# -------------------------------------------------------------------
+# Summary: Log without formatting text:
+# - Intern each message template, call site, and logger name once.
+# - Write each record as a small, length-prefixed binary frame:
+#   the template id, timestamp, level, call site id, and the raw args.
+# - Render the file later, as the same columnized text that
+#   My_Handler.format would have written, or as JSON.
+
+# Sample usage:
+#
+#   init_logging(DEBUG, log_bin_fname='/var/log/myapp.binlog')
+#
+#   $ python -m pyoiler_logging.binlog /var/log/myapp.binlog
+#   $ python -m pyoiler_logging.binlog --json /var/log/myapp.binlog
+
+"""
+
+File layout:
+
+  MAGIC, then frames. Each frame is:
+
+    <B kind> <I payload length> <payload>
+
+  and the frame kinds are:
+
+    HEADER   -- JSON: the formatter's fmt and datefmt, and the line
+                wrapping config. Each (re)opening of the file writes a
+                new header, which also resets the string tables, as
+                does a change of formatter or layout (e.g., on
+                reconfigure(log_line_len=...)). So
+                does the writer when its tables get to max_keys (e.g.,
+                when messages are formatted before they're logged, so
+                each has its own template).
+    TEMPLATE -- <I id> + the message template, UTF-8.
+    NAME     -- <I id> + a logger or level name, UTF-8.
+    SITE     -- <I id> <I lineno> + module NUL funcName, UTF-8.
+    KEY      -- <I id> <I template id> <I name id> <I levelname id>
+                <I site id> <H levelno> <Q thread>, i.e., everything
+                about a record that repeats from one call to the next.
+    RECORD   -- <I key id> <d created> + the args.
+    RECORD_EXC -- Same as RECORD, plus the exception text.
+
+  A frame cut short by a crash is ignored by the reader.
+
+"""
+
+import json
+import logging
+import os
+import struct
+import sys
+
+import pyoiler_logging
+from pyoiler_logging import My_Formatter, My_Handler
+
+__all__ = [
+    'My_BinaryFileHandler',
+    'read_records',
+    'render_text',
+    'render_json',
+]
+
+MAGIC = b'PYOLOGB1'
+
+FRAME_HEADER = 0
+FRAME_TEMPLATE = 1
+FRAME_NAME = 2
+FRAME_SITE = 3
+FRAME_KEY = 4
+FRAME_RECORD = 5
+FRAME_RECORD_EXC = 6
+
+_frame_hdr = struct.Struct('<BI')
+_id_hdr = struct.Struct('<I')
+_site_hdr = struct.Struct('<II')
+_key_hdr = struct.Struct('<IIIIIHQ')
+_record_hdr = struct.Struct('<Id')
+
+# Arg tags.
+ARG_NONE = b'n'
+ARG_TRUE = b't'
+ARG_FALSE = b'f'
+ARG_INT32 = b'j'
+ARG_INT = b'i'
+ARG_BIGINT = b'I'
+ARG_FLOAT = b'd'
+ARG_STR = b's'
+ARG_BYTES = b'b'
+ARG_OBJECT = b'o'
+ARG_NUMBER = b'N'
+ARG_MAPPING = b'm'
+
+_int32 = struct.Struct('<i')
+_int64 = struct.Struct('<q')
+_float = struct.Struct('<d')
+_len = struct.Struct('<I')
+_count = struct.Struct('<H')
+
+if sys.version_info.major == 2:
+    _text_type = unicode
+    _bytes_type = str
+    _int_types = (int, long)
+else:
+    _text_type = str
+    _bytes_type = bytes
+    _int_types = (int,)
+
+# SITE_UNKNOWN is for records whose call site we couldn't find.
+SITE_UNKNOWN = 0xFFFFFFFF
+
+# Our frames are not the call site, either.
+pyoiler_logging._call_site_skip.add(sys._getframe().f_code.co_filename)
+
+# ***
+
+def _encode_text(s):
+    b = s.encode('utf-8')
+    return _len.pack(len(b)) + b
+
+def _encode_arg(arg, parts):
+    # Order matters: bool is an int.
+    if arg is None:
+        parts.append(ARG_NONE)
+    elif arg is True:
+        parts.append(ARG_TRUE)
+    elif arg is False:
+        parts.append(ARG_FALSE)
+    elif isinstance(arg, _int_types):
+        if -0x80000000 <= arg <= 0x7FFFFFFF:
+            parts.append(ARG_INT32 + _int32.pack(arg))
+        elif -0x8000000000000000 <= arg <= 0x7FFFFFFFFFFFFFFF:
+            parts.append(ARG_INT + _int64.pack(arg))
+        else:
+            parts.append(ARG_BIGINT + _encode_text(str(arg)))
+    elif isinstance(arg, float):
+        parts.append(ARG_FLOAT + _float.pack(arg))
+    elif isinstance(arg, _text_type):
+        parts.append(ARG_STR + _encode_text(arg))
+    elif isinstance(arg, _bytes_type):
+        parts.append(ARG_BYTES + _len.pack(len(arg)) + arg)
+    else:
+        # We cannot keep arbitrary objects, so keep what %s and %r
+        # would say about them (which is the only text work we do),
+        # and, for numbers (e.g., Decimal), what %d and %f would use.
+        text = _encode_text(str(arg)) + _encode_text(repr(arg))
+        number = None
+        try:
+            if hasattr(arg, '__index__'):
+                number = repr(arg.__index__())
+            elif hasattr(arg, '__float__'):
+                number = repr(float(arg))
+        except (TypeError, ValueError, OverflowError, ArithmeticError):
+            pass
+        if number is not None:
+            parts.append(ARG_NUMBER + text + _encode_text(number))
+        else:
+            parts.append(ARG_OBJECT + text)
+
+def _encode_args(args, parts):
+    if isinstance(args, dict):
+        parts.append(ARG_MAPPING + _count.pack(len(args)))
+        for key, value in args.items():
+            parts.append(_encode_text(str(key)))
+            _encode_arg(value, parts)
+    else:
+        args = args or ()
+        parts.append(_count.pack(len(args)))
+        for arg in args:
+            _encode_arg(arg, parts)
+
+class _Rendered_Object(object):
+    """Stands in for an arg we could only keep as its str and repr."""
+
+    __slots__ = ('s', 'r')
+
+    def __init__(self, s, r):
+        self.s = s
+        self.r = r
+
+    def __str__(self):
+        return self.s
+
+    def __repr__(self):
+        return self.r
+
+class _Rendered_Number(_Rendered_Object):
+    """Same, for a number-like arg, so %d and %f work, too."""
+
+    __slots__ = ('n',)
+
+    def __init__(self, s, r, n):
+        _Rendered_Object.__init__(self, s, r)
+        self.n = n
+
+    def __int__(self):
+        return int(self.n)
+
+    def __float__(self):
+        return float(self.n)
+
+    # Python 2.
+    __long__ = __int__
+
+# ***
+
+class My_BinaryFileHandler(logging.Handler):
+    """
+    A handler that writes binary frames rather than formatted text.
+
+    The records are buffered, so call flush() (or close()) to be sure
+    they're on disk; records at ERROR and above are flushed right away.
+
+    The string tables are capped at max_keys record keys (and as many
+    templates), after which a new header starts them over.
+    """
+
+    accepts_fast_records = True
+
+    def __init__(
+        self,
+        filename,
+        mode='ab',
+        flush_level=logging.ERROR,
+        max_keys=4096,
+    ):
+        logging.Handler.__init__(self)
+        self.baseFilename = os.path.abspath(filename)
+        self.mode = mode
+        self.flush_level = flush_level
+        self.max_keys = max_keys
+        self.stream = None
+        # What the last header said.
+        self.header_formatter = None
+        self.header_layout = None
+        self._reset_tables()
+
+    def _reset_tables(self):
+        self.templates = {}
+        self.names = {}
+        self.sites = {}
+        self.keys = {}
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode)
+        if stream.tell() == 0:
+            stream.write(MAGIC)
+        stream.write(self._header())
+        return stream
+
+    def _header(self):
+        """
+        Return a HEADER frame, and reset the string tables to match.
+        """
+        layout = My_Handler.layout_of(self)
+        self.header_formatter = self.formatter
+        self.header_layout = layout
+        header = {
+            'fmt': self.formatter._fmt if self.formatter else None,
+            'datefmt': self.formatter.datefmt if self.formatter else None,
+            'line_len_log': layout.line_len_log,
+            'line_len_msg': layout.line_len_msg,
+            'msg_continuation_prefix': layout.msg_continuation_prefix,
+        }
+        payload = json.dumps(header).encode('utf-8')
+        self._reset_tables()
+        return _frame_hdr.pack(FRAME_HEADER, len(payload)) + payload
+
+    def _intern(self, table, kind, value, parts):
+        try:
+            return table[value]
+        except KeyError:
+            ident = len(table)
+            payload = _id_hdr.pack(ident) + value.encode('utf-8')
+            parts.append(_frame_hdr.pack(kind, len(payload)) + payload)
+            table[value] = ident
+            return ident
+
+    def _intern_site(self, frame, parts):
+        if frame is None:
+            return SITE_UNKNOWN
+        key = (frame.f_code, frame.f_lineno)
+        try:
+            return self.sites[key]
+        except KeyError:
+            mod, func, lineno = pyoiler_logging._call_site()
+            ident = len(self.sites)
+            payload = (
+                _site_hdr.pack(ident, lineno)
+                + ('%s\0%s' % (mod, func)).encode('utf-8')
+            )
+            parts.append(_frame_hdr.pack(FRAME_SITE, len(payload)) + payload)
+            self.sites[key] = ident
+            return ident
+
+    def _intern_key(self, key, record, msg, frame, parts):
+        template_id = self._intern(self.templates, FRAME_TEMPLATE, msg, parts)
+        name_id = self._intern(self.names, FRAME_NAME, record.name, parts)
+        levelname_id = self._intern(self.names, FRAME_NAME, record.levelname, parts)
+        site_id = self._intern_site(frame, parts)
+        ident = len(self.keys)
+        payload = _key_hdr.pack(
+            ident,
+            template_id,
+            name_id,
+            levelname_id,
+            site_id,
+            record.levelno,
+            record.thread or 0,
+        )
+        parts.append(_frame_hdr.pack(FRAME_KEY, len(payload)) + payload)
+        self.keys[key] = ident
+        return ident
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            parts = []
+            # The header carries the format and the layout, so if either
+            # changed, start a new one.
+            layout = My_Handler.layout_of(self)
+            if (
+                self.formatter is not self.header_formatter
+                or (layout is not self.header_layout and layout != self.header_layout)
+            ):
+                parts.append(self._header())
+            msg = record.msg
+            if not isinstance(msg, _text_type):
+                msg = str(msg)
+            # Key the record by its code object and line, and not by its
+            # module and func names, so the hot path does no string work.
+            frame = pyoiler_logging._call_site_frame()
+            if frame is not None:
+                key = (msg, record.name, record.levelno, record.thread,
+                       frame.f_code, frame.f_lineno)
+            else:
+                key = (msg, record.name, record.levelno, record.thread)
+            try:
+                key_id = self.keys[key]
+            except KeyError:
+                if (
+                    len(self.keys) >= self.max_keys
+                    or len(self.templates) >= self.max_keys
+                ):
+                    # Don't grow without end: start the tables over.
+                    parts.append(self._header())
+                key_id = self._intern_key(key, record, msg, frame, parts)
+            body = [_record_hdr.pack(key_id, record.created)]
+            _encode_args(record.args, body)
+            kind = FRAME_RECORD
+            if record.exc_info or record.exc_text:
+                # Tracebacks are rare enough to format now (and the
+                # traceback objects don't outlive the call, anyway).
+                fmt = self.formatter or logging._defaultFormatter
+                if not record.exc_text:
+                    record.exc_text = fmt.formatException(record.exc_info)
+                exc_text = record.exc_text
+                body.append(_encode_text(exc_text))
+                kind = FRAME_RECORD_EXC
+            payload = b''.join(body)
+            parts.append(_frame_hdr.pack(kind, len(payload)) + payload)
+            self.stream.write(b''.join(parts))
+            if record.levelno >= self.flush_level:
+                self.stream.flush()
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self.stream.flush()
+                self.stream.close()
+                self.stream = None
+        finally:
+            self.release()
+        logging.Handler.close(self)
+
+# ***
+
+class _Reader(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def text(self):
+        (n,) = _len.unpack_from(self.data, self.pos)
+        self.pos += _len.size
+        s = self.data[self.pos:self.pos + n].decode('utf-8')
+        self.pos += n
+        return s
+
+    def arg(self):
+        tag = self.data[self.pos:self.pos + 1]
+        self.pos += 1
+        if tag == ARG_NONE:
+            return None
+        elif tag == ARG_TRUE:
+            return True
+        elif tag == ARG_FALSE:
+            return False
+        elif tag == ARG_INT32:
+            (value,) = _int32.unpack_from(self.data, self.pos)
+            self.pos += _int32.size
+            return value
+        elif tag == ARG_INT:
+            (value,) = _int64.unpack_from(self.data, self.pos)
+            self.pos += _int64.size
+            return value
+        elif tag == ARG_BIGINT:
+            return int(self.text())
+        elif tag == ARG_FLOAT:
+            (value,) = _float.unpack_from(self.data, self.pos)
+            self.pos += _float.size
+            return value
+        elif tag == ARG_STR:
+            return self.text()
+        elif tag == ARG_BYTES:
+            (n,) = _len.unpack_from(self.data, self.pos)
+            self.pos += _len.size
+            value = self.data[self.pos:self.pos + n]
+            self.pos += n
+            return value
+        elif tag == ARG_OBJECT:
+            s = self.text()
+            return _Rendered_Object(s, self.text())
+        elif tag == ARG_NUMBER:
+            s = self.text()
+            r = self.text()
+            number = self.text()
+            try:
+                number = int(number)
+            except ValueError:
+                number = float(number)
+            return _Rendered_Number(s, r, number)
+        raise ValueError('Unknown arg tag: %r' % (tag,))
+
+    def args(self):
+        if self.data[self.pos:self.pos + 1] == ARG_MAPPING:
+            self.pos += 1
+            (n,) = _count.unpack_from(self.data, self.pos)
+            self.pos += _count.size
+            args = {}
+            for _ in range(n):
+                key = self.text()
+                args[key] = self.arg()
+            return args
+        (n,) = _count.unpack_from(self.data, self.pos)
+        self.pos += _count.size
+        return tuple(self.arg() for _ in range(n))
+
+def _iter_frames(data):
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a binary log file.')
+    pos = len(MAGIC)
+    end = len(data)
+    while pos + _frame_hdr.size <= end:
+        kind, n = _frame_hdr.unpack_from(data, pos)
+        pos += _frame_hdr.size
+        if pos + n > end:
+            # A partial frame, probably from a crash.
+            break
+        yield kind, data[pos:pos + n]
+        pos += n
+
+def read_records(filename):
+    """
+    Yield (header, LogRecord) for each record in the binary log file.
+
+    The records have their call site set, i.e., they're ready for
+    My_Handler.render, which is what My_Handler.format would do.
+    """
+    with open(filename, 'rb') as stream:
+        data = stream.read()
+    header = {}
+    templates = {}
+    names = {}
+    sites = {}
+    keys = {}
+    for kind, payload in _iter_frames(data):
+        if kind == FRAME_RECORD or kind == FRAME_RECORD_EXC:
+            key_id, created = _record_hdr.unpack_from(payload, 0)
+            template, name, levelname, site, levelno, thread = keys[key_id]
+            reader = _Reader(payload)
+            reader.pos = _record_hdr.size
+            args = reader.args()
+            exc_text = None
+            if kind == FRAME_RECORD_EXC:
+                exc_text = reader.text()
+            record = logging.makeLogRecord({
+                'name': name,
+                'msg': template,
+                'args': args,
+                'levelno': levelno,
+                'levelname': levelname,
+                'created': created,
+                'msecs': (created - int(created)) * 1000,
+                'thread': thread,
+                'exc_text': exc_text,
+            })
+            if site is not None:
+                record.module, record.funcName, record.lineno = site
+            yield header, record
+        elif kind == FRAME_KEY:
+            (
+                ident,
+                template_id,
+                name_id,
+                levelname_id,
+                site_id,
+                levelno,
+                thread,
+            ) = _key_hdr.unpack_from(payload, 0)
+            keys[ident] = (
+                templates[template_id],
+                names[name_id],
+                names[levelname_id],
+                sites.get(site_id),
+                levelno,
+                thread,
+            )
+        elif kind == FRAME_TEMPLATE:
+            (ident,) = _id_hdr.unpack_from(payload, 0)
+            templates[ident] = payload[_id_hdr.size:].decode('utf-8')
+        elif kind == FRAME_NAME:
+            (ident,) = _id_hdr.unpack_from(payload, 0)
+            names[ident] = payload[_id_hdr.size:].decode('utf-8')
+        elif kind == FRAME_SITE:
+            ident, lineno = _site_hdr.unpack_from(payload, 0)
+            mod, func = payload[_site_hdr.size:].decode('utf-8').split('\0', 1)
+            sites[ident] = (mod, func, lineno)
+        elif kind == FRAME_HEADER:
+            header = json.loads(payload.decode('utf-8'))
+            templates = {}
+            names = {}
+            sites = {}
+            keys = {}
+        # else, a frame kind from the future; skip it.
+
+def render_text(filename, out=None):
+    """
+    Write the binary log file as text, just as My_Handler.format would
+    have written it, with line wrapping.
+    """
+    if out is None:
+        out = sys.stdout
+    formatters = {}
+    for header, record in read_records(filename):
+        key = (header.get('fmt'), header.get('datefmt'))
+        try:
+            fmt = formatters[key]
+        except KeyError:
+            fmt = formatters[key] = My_Formatter(*key)
+        layout = (
+            header.get('line_len_log'),
+            header.get('line_len_msg'),
+            header.get('msg_continuation_prefix'),
+        )
+        try:
+            text = My_Handler.render(fmt, record, *layout)
+        except (TypeError, ValueError, KeyError):
+            _unformat(record)
+            text = My_Handler.render(fmt, record, *layout)
+        out.write(text)
+        out.write('\n')
+
+def _unformat(record):
+    """
+    The args don't fit the template (e.g., an object we only kept as
+    text, for a %d). Say so, rather than give up on the file.
+    """
+    args = record.args
+    if isinstance(args, dict):
+        args = ['%s=%s' % (key, value) for key, value in sorted(args.items())]
+    record.msg = '%s [args: %s]' % (record.msg, ', '.join(str(arg) for arg in args or ()))
+    record.args = None
+
+def _message(record):
+    try:
+        return record.getMessage()
+    except (TypeError, ValueError, KeyError):
+        _unformat(record)
+        return record.getMessage()
+
+def render_json(filename, out=None):
+    """
+    Write the binary log file as JSON, one record per line.
+    """
+    if out is None:
+        out = sys.stdout
+    for header, record in read_records(filename):
+        out.write(json.dumps({
+            'created': record.created,
+            'levelno': record.levelno,
+            'levelname': record.levelname,
+            'name': record.name,
+            'module': record.module,
+            'funcName': record.funcName,
+            'lineno': record.lineno,
+            'thread': record.thread,
+            'message': _message(record),
+            'exc_text': record.exc_text,
+        }))
+        out.write('\n')
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Render a pyoiler_logging binary log file.',
+    )
+    parser.add_argument('filename')
+    parser.add_argument(
+        '--json', action='store_true', help='Write JSON lines, not text.',
+    )
+    args = parser.parse_args(argv)
+    if args.json:
+        render_json(args.filename)
+    else:
+        render_text(args.filename)
+
+if __name__ == '__main__':
+    main()
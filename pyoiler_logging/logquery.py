@@ -0,0 +1,635 @@
+# File: pyoiler_logging/logquery.py
+#  /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+# Author: Landon Bouma (landonb &#x40; retrosoft &#x2E; com)
+# Project: https://github.com/landonb/pyoiler-logging
+# Summary: Indexed queries against pyoiler_logging text log files.
+# License: GPLv3. See LICENSE.txt.
+# -------------------------------------------------------------------
+# Summary: Query log files without grepping them:
+# - Memory-map the log file.
+# - Reassemble records, including wrapped and multi-line messages.
+# - Keep a sidecar index (FILE.idx) of time buckets: for each, its
+#   byte range, time range, highest level, and modules; and update it
+#   incrementally as the file grows.
+# - Answer queries by bisecting the (memory-mapped) index, and reading
+#   just the buckets that might match.
+
+# Sample usage:
+#
+#   $ python -m pyoiler_logging.logquery /var/log/myapp.log \
+#       --level ERROR --module db_pool --since 10:00 --until 10:05
+#
+#   from pyoiler_logging.logquery import query
+#   for record in query('/var/log/myapp.log', level='ERROR', module='db_pool'):
+#       print(record.text)
+
+"""
+
+A record starts with a header line, i.e., the default layout,
+
+  LEVL|2016-Oct-13|Thu|11:42:33|name mod.func:line| msg
+
+and includes every line after it that's not a header line, i.e., the
+continuation lines of a wrapped message (which start with the message
+continuation prefix), and the lines of a verbatim, multi-line message
+(e.g., a traceback).
+
+The index file is:
+
+  MAGIC <I crc32 of the first bytes of the log> <I how many bytes>
+  <I flags>
+
+followed by one fixed-size entry per bucket, in file order:
+
+  <Q start offset> <Q end offset> <I min seconds> <I max seconds>
+  <I max seconds so far> <I record count> <H max levelno> <H 0>
+  <Q module mask>
+
+A bucket holds the records logged in the same bucket_seconds (or, in
+a burst, bucket_bytes of them). The module mask has a bit set for each
+module (and each of its parent packages) in the bucket, by hash, so a
+clear bit means the module's not there. The max seconds so far only
+grow, so a query bisects them for since; and unless the clock ever went
+backwards (FLAG_UNSORTED), it bisects the min seconds for until, too.
+
+The most recent bucket is never indexed, since it might not be done
+(and nor might its last record: more continuation lines could be on
+their way); a query scans that tail directly. If the log is truncated
+or replaced (rotated), the prefix checksum no longer matches, and the
+index is rebuilt.
+
+"""
+
+import bisect
+import calendar
+import datetime
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+
+from . import level_value
+
+__all__ = [
+    'Log_Index',
+    'Log_Record',
+    'query',
+]
+
+MAGIC = b'PYOLOGI2'
+
+_index_hdr = struct.Struct('<III')
+_bucket = struct.Struct('<QQIIIIHHQ')
+
+FLAG_UNSORTED = 0x1
+
+# Bucket fields.
+B_START = 0
+B_END = 1
+B_MIN = 2
+B_MAX = 3
+B_MAX_SO_FAR = 4
+B_COUNT = 5
+B_LEVEL = 6
+B_MODULES = 8
+
+# How much of the log to checksum to recognize it again.
+IDENT_LEN = 4096
+
+# SYNC_ME: Log levels. See init_logging_impl.
+LEVEL_NUMBERS = {
+    'FATL': 50,
+    'CRIT': 50,
+    'ERRR': 40,
+    'WARN': 30,
+    'NTCE': 25,
+    'INFO': 20,
+    'TRCE': 15,
+    'DEBG': 10,
+    'VRB1': 9,
+    'VRB2': 8,
+    'VRB3': 7,
+    'VRB4': 6,
+    'VRB5': 5,
+    'VRBS': 5,
+}
+
+MONTHS = dict(
+    (name.encode('ascii'), num + 1) for num, name in enumerate((
+        'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+        'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec',
+    ))
+)
+
+# The optional thread ID (add_thread_id), the level, the date
+# (log_dfmat = '%Y-%b-%d|%a|%H:%M:%S'), and then the names.
+HEADER_RE = re.compile(
+    br'(?:\s*\d+ )?([^|\n]+)\|(\d{4})-([A-Za-z]{3})-(\d{2})\|[A-Za-z]{3}\|'
+    br'(\d{2}):(\d{2}):(\d{2})\|([^|\n]*)'
+)
+
+MOD_FUNC_LINE_RE = re.compile(br'(\S+)\.[^.\s]+:\d+$')
+
+_epoch_ordinal = datetime.date(1970, 1, 1).toordinal()
+
+def _level_number(name):
+    """
+    Return the level number for a header's level name (e.g., 'NTCE'), or
+    for a full level name (e.g., 'NOTICE', or 'VERBOSE3'). Raises
+    ValueError for an unknown name, rather than match every level.
+    """
+    try:
+        return LEVEL_NUMBERS[name]
+    except KeyError:
+        return level_value(name)
+
+def _module_bits(module):
+    """
+    Return the module mask bits for module, i.e., for it, and for each
+    package it's in, since a query for a package matches its modules.
+    """
+    bits = 0
+    parts = module.split(b'.')
+    for n in range(1, len(parts) + 1):
+        bits |= 1 << (zlib.crc32(b'.'.join(parts[:n])) & 63)
+    return bits
+
+def _module_bit(module):
+    return 1 << (zlib.crc32(module) & 63)
+
+def _parse_when(when, default_date=None):
+    """
+    Return seconds for a datetime, or for a string, either
+    'YYYY-MM-DD HH:MM[:SS]' or 'HH:MM[:SS]' (on default_date).
+    """
+    if when is None:
+        return None
+    if isinstance(when, datetime.datetime):
+        return calendar.timegm(when.timetuple())
+    if isinstance(when, (int, float)):
+        return int(when)
+    when = when.strip()
+    for frmat in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+        try:
+            return calendar.timegm(
+                datetime.datetime.strptime(when, frmat).timetuple()
+            )
+        except ValueError:
+            pass
+    for frmat in ('%H:%M:%S', '%H:%M'):
+        try:
+            clock = datetime.datetime.strptime(when, frmat).time()
+        except ValueError:
+            continue
+        if default_date is None:
+            default_date = datetime.date.today()
+        return calendar.timegm(
+            datetime.datetime.combine(default_date, clock).timetuple()
+        )
+    raise ValueError('Unrecognized time: %r' % (when,))
+
+# ***
+
+class Log_Record(object):
+    """
+    One log record, as reassembled from the log file.
+    """
+
+    __slots__ = (
+        'offset',
+        'levelname',
+        'levelno',
+        'seconds',
+        'module',
+        'text',
+    )
+
+    def __init__(self, offset, levelname, levelno, seconds, module, text):
+        self.offset = offset
+        self.levelname = levelname
+        self.levelno = levelno
+        self.seconds = seconds
+        self.module = module
+        self.text = text
+
+    @property
+    def when(self):
+        return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=self.seconds)
+
+    def unwrapped(self, msg_continuation_prefix='| '):
+        """
+        Return the record as one line, i.e., undo the line wrapping.
+        (A verbatim, multi-line record keeps its other newlines.)
+        """
+        lines = self.text.split('\n')
+        parts = [lines[0]]
+        for line in lines[1:]:
+            if msg_continuation_prefix and line.startswith(msg_continuation_prefix):
+                parts.append(line[len(msg_continuation_prefix):])
+            else:
+                parts.append('\n' + line)
+        return ''.join(parts)
+
+    def __repr__(self):
+        return 'Log_Record(%d, %r, %r)' % (self.offset, self.levelname, self.module)
+
+# ***
+
+class _Scanner(object):
+    """
+    Finds the records in a memory-mapped log file.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.dates = {}
+
+    def _seconds(self, match):
+        key = match.group(2, 3, 4)
+        try:
+            day_secs = self.dates[key]
+        except KeyError:
+            year, month, day = key
+            ordinal = datetime.date(int(year), MONTHS[month], int(day)).toordinal()
+            day_secs = self.dates[key] = (ordinal - _epoch_ordinal) * 86400
+        hour, minute, second = match.group(5, 6, 7)
+        return day_secs + int(hour) * 3600 + int(minute) * 60 + int(second)
+
+    @staticmethod
+    def _module(names):
+        names = names.strip()
+        if not names:
+            return b''
+        last = names.split()[-1]
+        match = MOD_FUNC_LINE_RE.match(last)
+        if match is not None:
+            return match.group(1)
+        # Just the logger name.
+        return names.split()[0]
+
+    def scan(self, start, end):
+        """
+        Yield (offset, length, header match) for each record that starts
+        at or after start and before end, and whose end is known, i.e.,
+        not the last record before end. Afterwards, self.last is the
+        offset of that last record (which might not be done).
+        """
+        data = self.data
+        pos = start
+        current = None
+        while pos < end:
+            eol = data.find(b'\n', pos, end)
+            if eol == -1:
+                # A partial line, still being written.
+                break
+            match = HEADER_RE.match(data, pos, eol)
+            if match is not None:
+                if current is not None:
+                    offset, header = current
+                    yield offset, pos - offset, header
+                current = (pos, match)
+            pos = eol + 1
+        self.last = current[0] if current is not None else pos
+
+    def scan_all(self, start, end):
+        """
+        Same as scan, but also yield the last record, up to end.
+        """
+        for found in self.scan(start, end):
+            yield found
+        last = self.last
+        if last < end:
+            match = HEADER_RE.match(self.data, last, end)
+            if match is not None:
+                yield last, end - last, match
+
+    @staticmethod
+    def _level(levelname):
+        try:
+            return _level_number(levelname.decode('ascii', 'replace'))
+        except ValueError:
+            # Not ours to judge what someone else's levels mean.
+            return 0
+
+    def describe(self, match):
+        levelname = match.group(1).strip()
+        return (
+            self._seconds(match),
+            levelname,
+            self._level(levelname),
+            self._module(match.group(8)),
+        )
+
+# ***
+
+class _Buckets(object):
+    """
+    The bucket entries of a memory-mapped index, as a sequence of one of
+    their fields, for bisect.
+    """
+
+    def __init__(self, data, count, field):
+        self.data = data
+        self.count = count
+        self.field = field
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return _bucket.unpack_from(
+            self.data, len(MAGIC) + _index_hdr.size + i * _bucket.size,
+        )[self.field]
+
+class Log_Index(object):
+    """
+    The sidecar index for one log file.
+    """
+
+    def __init__(
+        self,
+        log_path,
+        index_path=None,
+        bucket_seconds=60,
+        bucket_bytes=1024 * 1024,
+    ):
+        self.log_path = log_path
+        self.index_path = index_path or (log_path + '.idx')
+        self.bucket_seconds = bucket_seconds
+        self.bucket_bytes = bucket_bytes
+        self._reset()
+
+    def _reset(self):
+        self.ident = None
+        self.flags = 0
+        # How many buckets, and where the last ends, and its max so far.
+        self.count = 0
+        self.end = 0
+        self.max_so_far = 0
+        self.loaded = False
+
+    def _load(self):
+        """
+        Read the index header, and its last bucket (not the rest).
+        """
+        self._reset()
+        self.loaded = True
+        try:
+            index_file = open(self.index_path, 'rb')
+        except IOError:
+            return
+        with index_file:
+            head = index_file.read(len(MAGIC) + _index_hdr.size)
+            if (
+                len(head) < len(MAGIC) + _index_hdr.size
+                or head[:len(MAGIC)] != MAGIC
+            ):
+                return
+            crc, n, self.flags = _index_hdr.unpack_from(head, len(MAGIC))
+            self.ident = (crc, n)
+            size = os.fstat(index_file.fileno()).st_size
+            # (Not counting a torn entry at the end.)
+            self.count = (size - len(head)) // _bucket.size
+            if self.count:
+                index_file.seek(len(head) + (self.count - 1) * _bucket.size)
+                last = _bucket.unpack(index_file.read(_bucket.size))
+                self.end = last[B_END]
+                self.max_so_far = last[B_MAX_SO_FAR]
+
+    @staticmethod
+    def _identify(data):
+        n = min(IDENT_LEN, len(data))
+        return (zlib.crc32(data[:n]) & 0xFFFFFFFF, n)
+
+    @staticmethod
+    def _open(path):
+        try:
+            map_file = open(path, 'rb')
+        except IOError:
+            return None, None
+        size = os.fstat(map_file.fileno()).st_size
+        if size == 0:
+            map_file.close()
+            return None, None
+        data = mmap.mmap(map_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return map_file, data
+
+    def _open_log(self):
+        return self._open(self.log_path)
+
+    def update(self):
+        """
+        Index whatever the log file gained since the last update.
+        """
+        if not self.loaded:
+            self._load()
+        log_file, data = self._open_log()
+        if data is None:
+            return
+        try:
+            ident = self._identify(data)
+            if (
+                (self.ident is None)
+                or (self.ident[1] > len(data))
+                or (self._identify(data[:self.ident[1]]) != self.ident)
+                or (self.end > len(data))
+            ):
+                # A new file (or rotated, or truncated): start over.
+                self._reset()
+                self.loaded = True
+                self.ident = ident
+                with open(self.index_path, 'wb') as index_file:
+                    index_file.write(MAGIC + _index_hdr.pack(ident[0], ident[1], 0))
+            out = self._buckets(data)
+            if out:
+                with open(self.index_path, 'r+b') as index_file:
+                    # Overwrite any torn entry at the end.
+                    index_file.seek(len(MAGIC) + _index_hdr.size + self.count * _bucket.size)
+                    index_file.truncate()
+                    for bucket in out:
+                        index_file.write(_bucket.pack(*bucket))
+                    index_file.seek(len(MAGIC))
+                    index_file.write(_index_hdr.pack(self.ident[0], self.ident[1], self.flags))
+                self.count += len(out)
+                self.end = out[-1][B_END]
+                self.max_so_far = out[-1][B_MAX_SO_FAR]
+        finally:
+            data.close()
+            log_file.close()
+
+    def _buckets(self, data):
+        """
+        Return the (done) buckets after self.end.
+        """
+        out = []
+        scanner = _Scanner(data)
+        max_so_far = self.max_so_far
+        bucket = None
+        for offset, length, match in scanner.scan(self.end, len(data)):
+            seconds, levelname, levelno, module = scanner.describe(match)
+            if bucket is not None and (
+                seconds // self.bucket_seconds != bucket[B_MIN] // self.bucket_seconds
+                or offset - bucket[B_START] >= self.bucket_bytes
+            ):
+                out.append(tuple(bucket))
+                bucket = None
+            if bucket is None:
+                if seconds < max_so_far:
+                    # The clock went backwards, so no bisecting for until.
+                    self.flags |= FLAG_UNSORTED
+                bucket = [offset, 0, seconds, seconds, 0, 0, 0, 0, 0]
+            bucket[B_END] = offset + length
+            if seconds < bucket[B_MIN]:
+                self.flags |= FLAG_UNSORTED
+                bucket[B_MIN] = seconds
+            bucket[B_MAX] = max(bucket[B_MAX], seconds)
+            max_so_far = max(max_so_far, seconds)
+            bucket[B_MAX_SO_FAR] = max_so_far
+            bucket[B_COUNT] += 1
+            bucket[B_LEVEL] = max(bucket[B_LEVEL], min(levelno, 0xFFFF))
+            bucket[B_MODULES] |= _module_bits(module)
+        # The last bucket (still open) waits, like the last record.
+        return out
+
+    def query(self, since=None, until=None, level=None, module=None):
+        """
+        Yield the Log_Records at or above level, from module (or its
+        submodules), logged between since and until, inclusive.
+
+        The times are datetimes or strings; see _parse_when.
+        """
+        self.update()
+        default_date = None
+        if self.max_so_far:
+            default_date = (
+                datetime.date(1970, 1, 1)
+                + datetime.timedelta(seconds=self.max_so_far // 86400 * 86400)
+            )
+        since = _parse_when(since, default_date)
+        until = _parse_when(until, default_date)
+        if isinstance(level, str):
+            level = _level_number(level)
+        if isinstance(module, str):
+            module = module.encode('utf-8')
+        module_bit = _module_bit(module) if module is not None else 0
+
+        def wanted(seconds, levelno, mod_name):
+            if since is not None and seconds < since:
+                return False
+            if until is not None and seconds > until:
+                return False
+            if level is not None and levelno < level:
+                return False
+            if module is not None and not (
+                mod_name == module or mod_name.startswith(module + b'.')
+            ):
+                return False
+            return True
+
+        log_file, data = self._open_log()
+        if data is None:
+            return
+        index_file, index = self._open(self.index_path)
+        try:
+            scanner = _Scanner(data)
+            ranges = []
+            if index is not None:
+                count = min(
+                    self.count,
+                    (len(index) - len(MAGIC) - _index_hdr.size) // _bucket.size,
+                )
+                lo = 0
+                hi = count
+                if since is not None:
+                    lo = bisect.bisect_left(_Buckets(index, count, B_MAX_SO_FAR), since)
+                if until is not None and not (self.flags & FLAG_UNSORTED):
+                    hi = bisect.bisect_right(_Buckets(index, count, B_MIN), until)
+                for i in range(lo, hi):
+                    bucket = _bucket.unpack_from(
+                        index, len(MAGIC) + _index_hdr.size + i * _bucket.size,
+                    )
+                    if (
+                        (since is not None and bucket[B_MAX] < since)
+                        or (until is not None and bucket[B_MIN] > until)
+                        or (level is not None and bucket[B_LEVEL] < level)
+                        or (module is not None and not bucket[B_MODULES] & module_bit)
+                    ):
+                        continue
+                    ranges.append((bucket[B_START], bucket[B_END]))
+            # The tail: the open bucket (or more, if the file grew since
+            # update) that's not in the index.
+            ranges.append((self.end, len(data)))
+            for start, end in ranges:
+                for offset, length, match in scanner.scan_all(start, end):
+                    seconds, levelname, levelno, mod_name = scanner.describe(match)
+                    if wanted(seconds, levelno, mod_name):
+                        yield self._record(data, offset, length)
+        finally:
+            if index is not None:
+                index.close()
+                index_file.close()
+            data.close()
+            log_file.close()
+
+    def _record(self, data, offset, length):
+        raw = data[offset:offset + length]
+        match = HEADER_RE.match(raw)
+        scanner = _Scanner(raw)
+        seconds, levelname, levelno, module = scanner.describe(match)
+        return Log_Record(
+            offset,
+            levelname.decode('utf-8', 'replace'),
+            levelno,
+            seconds,
+            module.decode('utf-8', 'replace'),
+            raw.decode('utf-8', 'replace').rstrip('\n'),
+        )
+
+def query(log_path, since=None, until=None, level=None, module=None, index_path=None):
+    """
+    Update the index for log_path, and yield the matching Log_Records.
+    """
+    index = Log_Index(log_path, index_path)
+    for record in index.query(since, until, level, module):
+        yield record
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Query a pyoiler_logging log file, using a sidecar index.',
+    )
+    parser.add_argument('filename')
+    parser.add_argument('--since', help="E.g., '2016-10-13 10:00' or '10:00'.")
+    parser.add_argument('--until', help="E.g., '2016-10-13 10:05' or '10:05'.")
+    parser.add_argument('--level', help="The minimum level, e.g., 'ERROR' or 'ERRR'.")
+    parser.add_argument('--module', help='The module (or logger) name.')
+    parser.add_argument('--index', help='The index path (default: FILE.idx).')
+    parser.add_argument(
+        '--unwrap', action='store_true', help='Undo the line wrapping.',
+    )
+    parser.add_argument(
+        '--prefix', default='| ', help='The message continuation prefix.',
+    )
+    args = parser.parse_args(argv)
+    level = args.level
+    if level is not None and level.isdigit():
+        level = int(level)
+    for record in query(
+        args.filename,
+        since=args.since,
+        until=args.until,
+        level=level,
+        module=args.module,
+        index_path=args.index,
+    ):
+        if args.unwrap:
+            sys.stdout.write(record.unwrapped(args.prefix))
+        else:
+            sys.stdout.write(record.text)
+        sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,453 @@
+# File: pyoiler_logging/netsink.py
+#  /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+# Author: Landon Bouma (landonb &#x40; retrosoft &#x2E; com)
+# Project: https://github.com/landonb/pyoiler-logging
+# Summary: Batched network sinks: syslog (UDP/TCP/Unix) and Unix sockets.
+# License: GPLv3. See LICENSE.txt.
+# -------------------------------------------------------------------
+# Summary: Send log records to a collector, rather than tailing files:
+# - Format each record when it's logged (My_Handler.format, or JSON),
+#   and spool it in a bounded, in-memory buffer.
+# - A sender thread sends the spool in batches, over one persistent
+#   connection, reconnecting with exponential backoff.
+# - While the collector is down, the spool fills, and then drops the
+#   oldest records (and counts them).
+
+# Sample usage:
+#
+#   init_logging(INFO, log_to_syslog=('logs.example.com', 514),
+#                log_syslog_transport='tcp')
+#   init_logging(INFO, log_to_socket='/run/collector.sock')
+
+import collections
+import datetime
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+import pyoiler_logging
+from pyoiler_logging import My_Handler
+
+__all__ = [
+    'My_BatchingSocketHandler',
+    'My_SyslogHandler',
+    'My_UnixSocketHandler',
+]
+
+# SYNC_ME: Log levels. RFC 5424 severities.
+SYSLOG_SEVERITIES = (
+    (logging.CRITICAL, 2),           # Critical
+    (logging.ERROR, 3),              # Error
+    (logging.WARNING, 4),            # Warning
+    (pyoiler_logging.NOTICE, 5),     # Notice
+    (logging.INFO, 6),               # Informational
+    (logging.NOTSET, 7),             # Debug (TRACE, DEBUG, and VERBOSE*)
+)
+
+SYSLOG_TRANSPORTS = ('udp', 'tcp', 'unix', 'unix_stream')
+
+SYSLOG_FACILITIES = {
+    'kern': 0, 'user': 1, 'mail': 2, 'daemon': 3, 'auth': 4, 'syslog': 5,
+    'lpr': 6, 'news': 7, 'uucp': 8, 'cron': 9, 'authpriv': 10, 'ftp': 11,
+    'local0': 16, 'local1': 17, 'local2': 18, 'local3': 19,
+    'local4': 20, 'local5': 21, 'local6': 22, 'local7': 23,
+}
+
+# The SD-ID for structured data. (32473 is the RFC 5424 example PEN.)
+SD_ID = 'pyoiler@32473'
+
+try:
+    _utc = datetime.timezone.utc
+except AttributeError:
+    # Python 2.
+    _utc = None
+
+# Our frames are not the call site.
+pyoiler_logging._call_site_skip.add(sys._getframe().f_code.co_filename)
+
+def syslog_severity(levelno):
+    for level, severity in SYSLOG_SEVERITIES:
+        if levelno >= level:
+            return severity
+    return 7
+
+def _set_call_site(record):
+    # Like My_Handler.format does.
+    site = pyoiler_logging._call_site()
+    if site is not None:
+        record.module, record.funcName, record.lineno = site
+
+def _record_dict(record):
+    return {
+        'created': record.created,
+        'levelno': record.levelno,
+        'levelname': record.levelname,
+        'name': record.name,
+        'module': record.module,
+        'funcName': record.funcName,
+        'lineno': record.lineno,
+        'thread': record.thread,
+        'message': record.getMessage(),
+        'exc_text': record.exc_text,
+    }
+
+# ***
+
+class My_BatchingSocketHandler(logging.Handler):
+    """
+    The spool, the sender thread, and the connection, for subclasses
+    that say how to connect (connect) and what to send (encode, and
+    send_batch).
+    """
+
+    accepts_fast_records = True
+
+    def __init__(
+        self,
+        structured=False,
+        spool_size=10000,
+        batch_size=100,
+        flush_interval=0.25,
+        backoff_initial=0.5,
+        backoff_max=30.0,
+        timeout=5.0,
+        close_timeout=1.0,
+    ):
+        logging.Handler.__init__(self)
+        self.structured = structured
+        self.spool_size = spool_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.close_timeout = close_timeout
+        self.spool = collections.deque()
+        self.spool_cond = threading.Condition(threading.Lock())
+        self.dropped = 0
+        self.sent = 0
+        self.sock = None
+        self.backoff = 0.0
+        self.next_connect = 0.0
+        self.in_flight = 0
+        self.flushing = False
+        # Whether the last flush gave up, with the collector down.
+        self.stalled = False
+        self.closing = False
+        self.sender = threading.Thread(
+            target=self._run, name='pyoiler_logging-%s' % (type(self).__name__,),
+        )
+        self.sender.daemon = True
+        self.sender.start()
+
+    # *** Subclass hooks.
+
+    def connect(self):
+        raise NotImplementedError
+
+    def encode(self, record):
+        """Return the bytes for one record (called when it's logged)."""
+        if self.structured:
+            _set_call_site(record)
+            text = json.dumps(_record_dict(record))
+        else:
+            text = self.format(record)
+        return text.encode('utf-8')
+
+    def send_batch(self, sock, messages):
+        """Send the encoded messages. The default frames them by octet
+        counting (RFC 6587), i.e., 'LEN MSG', for stream sockets."""
+        sock.sendall(b''.join(
+            str(len(message)).encode('ascii') + b' ' + message
+            for message in messages
+        ))
+
+    # *** Handler.
+
+    def format(self, record):
+        return My_Handler.format(self, record)
+
+    def emit(self, record):
+        try:
+            message = self.encode(record)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            self.handleError(record)
+            return
+        with self.spool_cond:
+            self.spool.append(message)
+            while len(self.spool) > self.spool_size:
+                self.spool.popleft()
+                self.dropped += 1
+            if len(self.spool) >= self.batch_size:
+                self.spool_cond.notify()
+
+    def queue_depth(self):
+        return len(self.spool) + self.in_flight
+
+    def flush(self, timeout=None):
+        """
+        Wait (up to timeout, or flush_interval plus the socket timeout)
+        for the spool to drain, e.g., before exiting. Returns True if
+        it drained.
+
+        It stops waiting once nothing can be sent before the deadline
+        (i.e., the sender is backing off until after it).
+        """
+        if timeout is None:
+            timeout = self.flush_interval + self.timeout
+        deadline = time.time() + timeout
+        with self.spool_cond:
+            self.flushing = True
+            self.spool_cond.notify()
+            while self.spool or self.in_flight:
+                now = time.time()
+                if now >= deadline or (
+                    self.sock is None
+                    and not self.in_flight
+                    and self.next_connect >= deadline
+                ):
+                    self.stalled = True
+                    return False
+                self.spool_cond.wait(min(deadline - now, 0.05))
+            self.stalled = False
+            return True
+
+    def close(self):
+        # logging.shutdown flushes, and then closes, so don't wait again
+        # if that flush gave up, and otherwise, just briefly.
+        if not self.closing:
+            if not self.stalled:
+                self.flush(self.close_timeout)
+            with self.spool_cond:
+                self.closing = True
+                self.spool_cond.notify()
+            self.sender.join(self.close_timeout)
+            self._disconnect()
+        logging.Handler.close(self)
+
+    # *** The sender thread.
+
+    def _run(self):
+        while True:
+            with self.spool_cond:
+                # Wait for a full batch, or for flush_interval.
+                if (
+                    not self.closing
+                    and not self.flushing
+                    and len(self.spool) < self.batch_size
+                ):
+                    self.spool_cond.wait(self.flush_interval)
+                if self.closing:
+                    return
+                if not self.spool:
+                    self.flushing = False
+                    continue
+                batch = [
+                    self.spool.popleft()
+                    for _ in range(min(self.batch_size, len(self.spool)))
+                ]
+                self.in_flight = len(batch)
+            sent = self._send(batch)
+            with self.spool_cond:
+                self.in_flight = 0
+                if not sent:
+                    # Put them back, oldest first, and drop the oldest
+                    # if the spool filled up meanwhile.
+                    self.spool.extendleft(reversed(batch))
+                    while len(self.spool) > self.spool_size:
+                        self.spool.popleft()
+                        self.dropped += 1
+                else:
+                    self.sent += len(batch)
+                    self.stalled = False
+                self.spool_cond.notify_all()
+            if not sent:
+                # Wait out the backoff (unless closing).
+                with self.spool_cond:
+                    if not self.closing:
+                        self.spool_cond.wait(max(0.0, self.next_connect - time.time()))
+
+    def _send(self, batch):
+        if self.sock is None:
+            if time.time() < self.next_connect:
+                return False
+            # Not just socket errors: whatever goes wrong, the sender
+            # thread backs off and retries, rather than dying and
+            # leaving the batch in flight.
+            try:
+                self.sock = self.connect()
+                self.sock.settimeout(self.timeout)
+                self.backoff = 0.0
+            except Exception:
+                self._disconnect()
+                self._backoff()
+                return False
+        try:
+            self.send_batch(self.sock, batch)
+            return True
+        except Exception:
+            self._disconnect()
+            self._backoff()
+            return False
+
+    def _backoff(self):
+        if self.backoff:
+            self.backoff = min(self.backoff * 2, self.backoff_max)
+        else:
+            self.backoff = self.backoff_initial
+        self.next_connect = time.time() + self.backoff
+
+    def _disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except (OSError, socket.error):
+                pass
+            self.sock = None
+
+# ***
+
+class My_SyslogHandler(My_BatchingSocketHandler):
+    """
+    RFC 5424 syslog, over UDP (RFC 5426), TCP (RFC 6587, octet counting),
+    or a Unix domain socket (address is a path; transport 'unix' is a
+    datagram socket, like /dev/log, and 'unix_stream' a stream socket).
+    The transport defaults to 'unix' for a path, else 'udp'.
+
+    The MSG is the My_Handler.format text, or with structured=True, the
+    logged message, plus the logger name and call site as SD-PARAMs.
+    """
+
+    def __init__(
+        self,
+        address=('localhost', 514),
+        transport=None,
+        facility='user',
+        app_name=None,
+        hostname=None,
+        **kwargs
+    ):
+        if transport is None:
+            transport = 'unix' if isinstance(address, str) else 'udp'
+        if transport not in SYSLOG_TRANSPORTS:
+            raise ValueError('Unknown syslog transport: %r' % (transport,))
+        if transport in ('unix', 'unix_stream'):
+            if not isinstance(address, str):
+                raise ValueError(
+                    'Expected a socket path for syslog transport %r: %r'
+                    % (transport, address,)
+                )
+        elif isinstance(address, str) or len(address) != 2:
+            raise ValueError(
+                'Expected a (host, port) for syslog transport %r: %r'
+                % (transport, address,)
+            )
+        self.address = address
+        self.transport = transport
+        if not isinstance(facility, int):
+            facility = SYSLOG_FACILITIES[facility]
+        self.facility = facility
+        self.app_name = (app_name or os.path.basename(sys.argv[0] or '') or '-')[:48]
+        self.hostname = (hostname or socket.gethostname() or '-')[:255]
+        self.procid = str(os.getpid())
+        My_BatchingSocketHandler.__init__(self, **kwargs)
+
+    def connect(self):
+        if self.transport == 'udp':
+            host, port = self.address
+            family, socktype, proto, _, sockaddr = socket.getaddrinfo(
+                host, port, 0, socket.SOCK_DGRAM,
+            )[0]
+            sock = socket.socket(family, socktype, proto)
+            sock.connect(sockaddr)
+        elif self.transport == 'tcp':
+            sock = socket.create_connection(self.address, self.timeout)
+        elif self.transport in ('unix', 'unix_stream'):
+            socktype = socket.SOCK_DGRAM if self.transport == 'unix' else socket.SOCK_STREAM
+            sock = socket.socket(socket.AF_UNIX, socktype)
+            try:
+                sock.connect(self.address)
+            except:
+                sock.close()
+                raise
+        return sock
+
+    def encode(self, record):
+        pri = self.facility * 8 + syslog_severity(record.levelno)
+        if _utc is not None:
+            created = datetime.datetime.fromtimestamp(record.created, _utc)
+        else:
+            created = datetime.datetime.utcfromtimestamp(record.created)
+        timestamp = created.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        if self.structured:
+            msg = record.getMessage()
+            if record.exc_info and not record.exc_text:
+                fmt = self.formatter or logging._defaultFormatter
+                record.exc_text = fmt.formatException(record.exc_info)
+            if record.exc_text:
+                msg = '%s\n%s' % (msg, record.exc_text,)
+            _set_call_site(record)
+            sd = '[%s logger="%s" module="%s" func="%s" line="%s"]' % (
+                SD_ID,
+                _sd_escape(record.name),
+                _sd_escape(record.module),
+                _sd_escape(record.funcName),
+                record.lineno,
+            )
+        else:
+            msg = self.format(record)
+            sd = '-'
+        header = '<%d>1 %s %s %s %s - %s ' % (
+            pri,
+            timestamp,
+            self.hostname,
+            self.app_name,
+            self.procid,
+            sd,
+        )
+        # The BOM says the MSG is UTF-8.
+        return header.encode('utf-8') + b'\xef\xbb\xbf' + msg.encode('utf-8')
+
+    def send_batch(self, sock, messages):
+        if self.transport in ('udp', 'unix'):
+            # One message per datagram.
+            for message in messages:
+                sock.send(message)
+        else:
+            My_BatchingSocketHandler.send_batch(self, sock, messages)
+
+def _sd_escape(value):
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace(']', '\\]')
+    )
+
+class My_UnixSocketHandler(My_BatchingSocketHandler):
+    """
+    Records over a Unix domain stream socket, framed by octet counting,
+    i.e., 'LEN MSG', where MSG is the My_Handler.format text, or with
+    structured=True, a JSON object.
+    """
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        My_BatchingSocketHandler.__init__(self, **kwargs)
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except:
+            sock.close()
+            raise
+        return sock
@@ -0,0 +1,589 @@
+# File: pyoiler_logging/ziplog.py
+#  /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+# Author: Landon Bouma (landonb &#x40; retrosoft &#x2E; com)
+# Project: https://github.com/landonb/pyoiler-logging
+# Summary: Compressed, seekable log files, and their reader.
+# License: GPLv3. See LICENSE.txt.
+# -------------------------------------------------------------------
+# Summary: Compress the log as it's written, rather than after rotation:
+# - Write the same text My_FileHandler would, but in frames: each frame
+#   is a gzip member (or a zstd frame, if zstandard is installed) of
+#   about frame_size bytes of text, compressed on its own.
+# - Each frame carries its own record count and time range, and a
+#   sidecar index (FILE.idx) lists the frames, so a reader can seek to
+#   a time range and decompress just those frames.
+# - The text is buffered until the frame is done, so only the frame in
+#   progress is lost in a crash; the completed frames are synced first.
+
+# Sample usage:
+#
+#   init_logging(VERBOSE, log_zip_fname='/var/log/myapp.log.gz')
+#
+#   $ zcat /var/log/myapp.log.gz
+#   $ python -m pyoiler_logging.ziplog /var/log/myapp.log.gz \
+#       --since '2016-10-13 10:00' --until '2016-10-13 10:05'
+
+"""
+
+File layout:
+
+  gzip: The file is a plain multi-member gzip file, so zcat reads it.
+        Each member has a FEXTRA subfield, 'PL', with the frame meta.
+
+  zstd: The file is a plain multi-frame zstd file, so zstdcat reads it.
+        Each zstd frame follows a skippable frame with the frame meta.
+
+  The frame meta is:
+
+    <I compressed length> <I text length> <I record count>
+    <d first created> <d last created>
+
+  The index file is MAGIC, then an entry per frame:
+
+    <Q frame offset> + the frame meta
+
+  The index is a cache: on open, frames missing from it are added
+  (from their meta), and a frame cut short by a crash is truncated.
+  A file that's not all frames (e.g., a plain .gz from before) is
+  renamed FILE.unrecognized, and a new file started.
+
+"""
+
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import pyoiler_logging
+from pyoiler_logging import My_Handler
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = [
+    'My_CompressedFileHandler',
+    'Compressed_Log',
+    'read_text',
+]
+
+MAGIC = b'PYOLOGZ1'
+
+CODEC_GZIP = 'gzip'
+CODEC_ZSTD = 'zstd'
+
+_meta = struct.Struct('<IIIdd')
+_entry = struct.Struct('<Q')
+
+# gzip member header, with FEXTRA: ID1 ID2 CM FLG MTIME XFL OS XLEN,
+# then the subfield: SI1 SI2 LEN.
+_gzip_hdr = struct.Struct('<BBBBIBBHBBH')
+_gzip_trailer = struct.Struct('<II')
+GZIP_FEXTRA = 0x04
+GZIP_OS_UNKNOWN = 255
+GZIP_HEADER_LEN = _gzip_hdr.size + _meta.size
+
+# zstd skippable frame: <I magic> <I length>.
+_skippable_hdr = struct.Struct('<II')
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A5E
+ZSTD_HEADER_LEN = _skippable_hdr.size + _meta.size
+
+# How each of our frames starts: the gzip magic, deflate, and FEXTRA;
+# or the zstd skippable frame header.
+_gzip_lead = struct.pack('<BBBB', 0x1f, 0x8b, 8, GZIP_FEXTRA)
+_zstd_lead = _skippable_hdr.pack(ZSTD_SKIPPABLE_MAGIC, _meta.size)
+
+# Our frames are not the call site.
+pyoiler_logging._call_site_skip.add(sys._getframe().f_code.co_filename)
+
+# ***
+
+def _compress_gzip(data, count, first, last, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    header = _gzip_hdr.pack(
+        0x1f, 0x8b, 8, GZIP_FEXTRA, int(first), 0, GZIP_OS_UNKNOWN,
+        4 + _meta.size, ord('P'), ord('L'), _meta.size,
+    )
+    meta = _meta.pack(len(body), len(data), count, first, last)
+    trailer = _gzip_trailer.pack(zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff)
+    return header + meta + body + trailer
+
+def _compress_zstd(data, count, first, last, level):
+    body = zstandard.ZstdCompressor(level=level).compress(data)
+    meta = _meta.pack(len(body), len(data), count, first, last)
+    return _skippable_hdr.pack(ZSTD_SKIPPABLE_MAGIC, len(meta)) + meta + body
+
+def _codec_of(head):
+    if head[:2] == b'\x1f\x8b':
+        return CODEC_GZIP
+    if head[:4] == _skippable_hdr.pack(ZSTD_SKIPPABLE_MAGIC, _meta.size)[:4]:
+        return CODEC_ZSTD
+    return None
+
+def _read_frame_meta(stream, offset, size):
+    """
+    Return (frame length, meta) for the frame at offset, or None if
+    there's no complete frame there.
+    """
+    stream.seek(offset)
+    head = stream.read(max(GZIP_HEADER_LEN, ZSTD_HEADER_LEN))
+    codec = _codec_of(head)
+    if codec == CODEC_GZIP:
+        if len(head) < GZIP_HEADER_LEN:
+            return None
+        fields = _gzip_hdr.unpack_from(head, 0)
+        if (
+            fields[2] != 8
+            or fields[3] != GZIP_FEXTRA
+            or fields[8:11] != (ord('P'), ord('L'), _meta.size)
+        ):
+            return None
+        meta = _meta.unpack_from(head, _gzip_hdr.size)
+        length = GZIP_HEADER_LEN + meta[0] + _gzip_trailer.size
+    elif codec == CODEC_ZSTD:
+        if len(head) < ZSTD_HEADER_LEN:
+            return None
+        meta = _meta.unpack_from(head, _skippable_hdr.size)
+        length = ZSTD_HEADER_LEN + meta[0]
+    else:
+        return None
+    if offset + length > size:
+        # Cut short, probably by a crash.
+        return None
+    return length, meta
+
+def _is_torn_frame(stream, offset):
+    """
+    Whether what's at offset looks like the start of one of our frames,
+    i.e., a frame cut short, and not somebody else's data.
+    """
+    stream.seek(offset)
+    head = stream.read(len(_zstd_lead))
+    return any(
+        lead.startswith(head[:len(lead)]) for lead in (_gzip_lead, _zstd_lead)
+    )
+
+def _aside_path(path):
+    aside = path + '.unrecognized'
+    num = 0
+    while os.path.exists(aside):
+        num += 1
+        aside = '%s.unrecognized.%d' % (path, num,)
+    return aside
+
+class Frame(object):
+
+    __slots__ = (
+        'offset',
+        'length',
+        'meta',
+    )
+
+    def __init__(self, offset, length, meta):
+        self.offset = offset
+        self.length = length
+        self.meta = meta
+
+    @property
+    def count(self):
+        return self.meta[2]
+
+    @property
+    def first(self):
+        return self.meta[3]
+
+    @property
+    def last(self):
+        return self.meta[4]
+
+    def __repr__(self):
+        return 'Frame(offset=%d, length=%d, count=%d, first=%.3f, last=%.3f)' % (
+            self.offset, self.length, self.count, self.first, self.last,
+        )
+
+def _index_entry(frame):
+    return _entry.pack(frame.offset) + _meta.pack(*frame.meta)
+
+def _load_frames(path, index_path, repair=False):
+    """
+    Return the frames, from the index, plus any the index is missing.
+
+    With repair, also fix the index, and truncate a frame cut short
+    after the last complete frame (so that appending to it leaves a
+    readable file). But never truncate what's not ours: if the log
+    doesn't start with a frame, or has something other than a frame
+    after one, move it aside, and start over.
+    """
+    try:
+        with open(index_path, 'rb') as index_file:
+            data = index_file.read()
+    except (IOError, OSError):
+        data = b''
+    indexed = []
+    if data[:len(MAGIC)] == MAGIC:
+        pos = len(MAGIC)
+        entry_len = _entry.size + _meta.size
+        while pos + entry_len <= len(data):
+            (offset,) = _entry.unpack_from(data, pos)
+            indexed.append((offset, _meta.unpack_from(data, pos + _entry.size)))
+            pos += entry_len
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    frames = []
+    end = 0
+    index_good = 0
+    torn = False
+    if size:
+        with open(path, 'rb') as stream:
+            # Trust the index if its last frame checks out, else walk it,
+            # as far as it agrees with the log.
+            if indexed:
+                offset, meta = indexed[-1]
+                found = _read_frame_meta(stream, offset, size)
+                if found is not None and found[1] == meta:
+                    ends = [offset for offset, meta in indexed[1:]]
+                    ends.append(offset + found[0])
+                    for (offset, meta), next_offset in zip(indexed, ends):
+                        frames.append(Frame(offset, next_offset - offset, meta))
+                    end = ends[-1]
+            if not frames:
+                for offset, meta in indexed:
+                    if offset != end:
+                        break
+                    found = _read_frame_meta(stream, offset, size)
+                    if found is None or found[1] != meta:
+                        break
+                    frames.append(Frame(offset, found[0], meta))
+                    end += found[0]
+            index_good = len(frames)
+            # Then pick up the frames the index is missing.
+            while end < size:
+                found = _read_frame_meta(stream, end, size)
+                if found is None:
+                    break
+                frames.append(Frame(end, found[0], found[1]))
+                end += found[0]
+            torn = bool(frames) and end < size and _is_torn_frame(stream, end)
+    if repair:
+        if torn:
+            with open(path, 'r+b') as stream:
+                stream.truncate(end)
+        elif end < size:
+            os.rename(path, _aside_path(path))
+            frames = []
+            index_good = 0
+        if (
+            data[:len(MAGIC)] != MAGIC
+            or len(data) != len(MAGIC) + len(indexed) * (_entry.size + _meta.size)
+            or index_good != len(indexed)
+            or index_good != len(frames)
+        ):
+            with open(index_path, 'wb') as index_file:
+                index_file.write(MAGIC)
+                for frame in frames:
+                    index_file.write(_index_entry(frame))
+    return frames
+
+# ***
+
+class My_CompressedFileHandler(logging.Handler):
+    """
+    A handler that writes the same text as My_FileHandler, compressed,
+    in frames.
+
+    A frame is done when it holds frame_size bytes of text, when its
+    first record is max_frame_age seconds old, on a record at flush_level
+    or above, and on flush() or close().
+
+    But a record at flush_level only closes a frame if the last one was
+    written at least min_flush_interval seconds ago (else it's closed once
+    that's so), so an error storm doesn't write (and sync) a frame per
+    record. A closer thread writes the frames that come due between
+    records.
+    """
+
+    accepts_fast_records = True
+
+    def __init__(
+        self,
+        filename,
+        codec=CODEC_GZIP,
+        frame_size=512 * 1024,
+        max_frame_age=60.0,
+        flush_level=logging.ERROR,
+        min_flush_interval=1.0,
+        level=6,
+        fsync=True,
+    ):
+        logging.Handler.__init__(self)
+        if codec == CODEC_ZSTD and zstandard is None:
+            raise ValueError('The zstd codec needs the zstandard package.')
+        if codec not in (CODEC_GZIP, CODEC_ZSTD):
+            raise ValueError('Unknown codec: %r' % (codec,))
+        self.baseFilename = os.path.abspath(filename)
+        self.index_path = self.baseFilename + '.idx'
+        self.codec = codec
+        self.compress = _compress_zstd if codec == CODEC_ZSTD else _compress_gzip
+        self.compress_level = level
+        self.frame_size = frame_size
+        self.max_frame_age = max_frame_age
+        self.flush_level = flush_level
+        self.min_flush_interval = min_flush_interval
+        self.fsync = fsync
+        self.terminator = '\n'
+        self.stream = None
+        self.index_file = None
+        self.offset = 0
+        self.written_at = 0.0
+        self.closer = None
+        self.closer_wakeup = threading.Event()
+        self.closing = False
+        self._reset_frame()
+
+    def _reset_frame(self):
+        self.texts = []
+        self.text_len = 0
+        self.first = None
+        self.last = None
+        self.started = None
+        self.flush_due = False
+        # When the frame in progress has to be written, at the latest.
+        self.deadline = None
+
+    def _open(self):
+        frames = _load_frames(self.baseFilename, self.index_path, repair=True)
+        self.offset = frames[-1].offset + frames[-1].length if frames else 0
+        self.stream = open(self.baseFilename, 'ab')
+        self.index_file = open(self.index_path, 'ab')
+
+    def format(self, record):
+        return My_Handler.format(self, record)
+
+    def emit(self, record):
+        try:
+            text = self.format(record) + self.terminator
+            now = time.time()
+            if self.first is None:
+                self.first = record.created
+                self.started = now
+            self.last = record.created
+            self.texts.append(text)
+            self.text_len += len(text)
+            if record.levelno >= self.flush_level:
+                self.flush_due = True
+            deadline = self.started + self.max_frame_age
+            if self.flush_due:
+                deadline = min(deadline, self.written_at + self.min_flush_interval)
+            if self.text_len >= self.frame_size or now >= deadline:
+                self._write_frame()
+            elif self.deadline is None or deadline < self.deadline:
+                self.deadline = deadline
+                self._wake_closer()
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            self.handleError(record)
+
+    def _wake_closer(self):
+        if self.closer is None and not self.closing:
+            self.closer = threading.Thread(
+                target=self._run_closer, name='pyoiler_logging-ziplog',
+            )
+            self.closer.daemon = True
+            self.closer.start()
+        self.closer_wakeup.set()
+
+    def _run_closer(self):
+        while not self.closing:
+            # Clear before reading the deadline: a new one wakes us again.
+            self.closer_wakeup.clear()
+            deadline = self.deadline
+            if deadline is None:
+                self.closer_wakeup.wait()
+            else:
+                self.closer_wakeup.wait(max(0.0, deadline - time.time()))
+            if self.closing:
+                break
+            self.acquire()
+            try:
+                if self.deadline is not None and time.time() >= self.deadline:
+                    self._write_frame()
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                # E.g., the disk is full. The next record tries again.
+                pass
+            finally:
+                self.release()
+
+    def _write_frame(self):
+        if not self.texts:
+            return
+        if self.stream is None:
+            self._open()
+        data = ''.join(self.texts).encode('utf-8')
+        frame = self.compress(
+            data, len(self.texts), self.first, self.last, self.compress_level,
+        )
+        meta = _read_meta(frame)
+        self._reset_frame()
+        # The frame, and then its index entry, so the index never lists
+        # a frame that's not there (and _open adds any it's missing).
+        self.stream.write(frame)
+        self._sync(self.stream)
+        self.index_file.write(_entry.pack(self.offset) + _meta.pack(*meta))
+        self._sync(self.index_file)
+        self.offset += len(frame)
+        self.written_at = time.time()
+
+    def _sync(self, stream):
+        stream.flush()
+        if self.fsync:
+            os.fsync(stream.fileno())
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._write_frame()
+        finally:
+            self.release()
+
+    def close(self):
+        # (Not under the lock, which the closer might be waiting on.)
+        self.closing = True
+        self.closer_wakeup.set()
+        closer = self.closer
+        if closer is not None and closer is not threading.current_thread():
+            closer.join()
+        self.acquire()
+        try:
+            try:
+                self._write_frame()
+            finally:
+                for stream in (self.stream, self.index_file):
+                    if stream is not None:
+                        stream.close()
+                self.stream = None
+                self.index_file = None
+        finally:
+            self.release()
+        logging.Handler.close(self)
+
+def _read_meta(frame):
+    if frame[:2] == b'\x1f\x8b':
+        return _meta.unpack_from(frame, _gzip_hdr.size)
+    return _meta.unpack_from(frame, _skippable_hdr.size)
+
+# ***
+
+def _parse_when(when):
+    """
+    Return seconds for a number (seconds), a datetime, or a local time
+    string, 'YYYY-MM-DD HH:MM[:SS]'.
+    """
+    if when is None or isinstance(when, (int, float)):
+        return when
+    if not isinstance(when, str):
+        # A datetime.
+        return time.mktime(when.timetuple())
+    for frmat in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+        try:
+            return time.mktime(time.strptime(when.strip(), frmat))
+        except ValueError:
+            pass
+    raise ValueError('Unrecognized time: %r' % (when,))
+
+class Compressed_Log(object):
+    """
+    Reads a compressed log file, frame by frame.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or (path + '.idx')
+        self.frames = _load_frames(self.path, self.index_path)
+
+    def find(self, since=None, until=None):
+        """
+        Return the frames with records in [since, until].
+        """
+        since = _parse_when(since)
+        until = _parse_when(until)
+        return [
+            frame for frame in self.frames
+            if (since is None or frame.last >= since)
+            and (until is None or frame.first <= until)
+        ]
+
+    def read_frame(self, frame, stream=None):
+        """
+        Return the frame's text.
+        """
+        if stream is None:
+            with open(self.path, 'rb') as stream:
+                return self.read_frame(frame, stream)
+        stream.seek(frame.offset)
+        data = stream.read(frame.length)
+        if data[:2] == b'\x1f\x8b':
+            body = data[GZIP_HEADER_LEN:GZIP_HEADER_LEN + frame.meta[0]]
+            text = zlib.decompress(body, -zlib.MAX_WBITS)
+            crc, _ = _gzip_trailer.unpack_from(data, GZIP_HEADER_LEN + frame.meta[0])
+            if zlib.crc32(text) & 0xffffffff != crc:
+                raise ValueError('Bad CRC in the frame at %d.' % (frame.offset,))
+        else:
+            if zstandard is None:
+                raise ValueError('Reading zstd frames needs the zstandard package.')
+            text = zstandard.ZstdDecompressor().decompress(
+                data[ZSTD_HEADER_LEN:], max_output_size=frame.meta[1],
+            )
+        return text.decode('utf-8')
+
+    def read(self, since=None, until=None):
+        """
+        Yield the text of each frame with records in [since, until]. The
+        frames are whole, so they may start before since, or end after
+        until.
+        """
+        frames = self.find(since, until)
+        if not frames:
+            return
+        with open(self.path, 'rb') as stream:
+            for frame in frames:
+                yield self.read_frame(frame, stream)
+
+def read_text(path, since=None, until=None):
+    """
+    Return the log's text, or that of the frames in [since, until].
+    """
+    return ''.join(Compressed_Log(path).read(since, until))
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Read a pyoiler_logging compressed log file.',
+    )
+    parser.add_argument('filename')
+    parser.add_argument('--since', help="E.g., '2016-10-13 10:00'.")
+    parser.add_argument('--until', help="E.g., '2016-10-13 10:05'.")
+    parser.add_argument(
+        '--frames', action='store_true', help='List the frames, not the text.',
+    )
+    args = parser.parse_args(argv)
+    log = Compressed_Log(args.filename)
+    if args.frames:
+        for frame in log.find(args.since, args.until):
+            sys.stdout.write('%r\n' % (frame,))
+    else:
+        for text in log.read(args.since, args.until):
+            sys.stdout.write(text)
+
+if __name__ == '__main__':
+    main()
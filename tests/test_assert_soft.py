@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+def setup_function(function):
+    pyoiler_logging.assert_soft_failures.clear()
+
+def teardown_function(function):
+    pyoiler_logging.config_assert_soft(enabled=True, summary_every=1000)
+
+def _fail_here():
+    pyoiler_logging.assert_soft(False, 'Hot loop failure')
+
+def test_aggregation(monkeypatch):
+    logged = []
+    monkeypatch.setattr(
+        pyoiler_logging, 'fatal', lambda *args, **kwargs: logged.append(args),
+    )
+    pyoiler_logging.config_assert_soft(summary_every=10)
+    for _ in range(25):
+        _fail_here()
+    pyoiler_logging.assert_soft(True)
+    pyoiler_logging.assert_soft(False)
+    assert logged == [
+        ('Hot loop failure',),
+        ('Soft assertion failed %d times: %s', 10, 'Hot loop failure'),
+        ('Soft assertion failed %d times: %s', 20, 'Hot loop failure'),
+        (),
+    ]
+    rows = pyoiler_logging.assert_soft_report(log_it=False)
+    assert [row[0] for row in rows] == [25, 1]
+    assert rows[0][1].startswith('test_assert_soft._fail_here:')
+    assert rows[1][2] == 'Assertion failed.'
+
+def test_disabled():
+    pyoiler_logging.config_assert_soft(enabled=False)
+    assert pyoiler_logging.assert_soft is pyoiler_logging.assert_soft_noop
+    pyoiler_logging.assert_soft(False)
+    assert not pyoiler_logging.assert_soft_failures
+    pyoiler_logging.config_assert_soft(enabled=True)
+    pyoiler_logging.assert_soft(False)
+    assert len(pyoiler_logging.assert_soft_failures) == 1
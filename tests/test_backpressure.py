@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import logging
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+class List_Handler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def teardown_function(function):
+    init_logging(log_level=0)
+    assert pyoiler_logging.backpressure is None
+    assert pyoiler_logging.shed_level == 0
+
+def test_shed_and_restore():
+    init_logging(
+        log_level=pyoiler_logging.VERBOSE,
+        log_backpressure={
+            'max_records_per_sec': 1000,
+            'interval': 3600,
+            'restore_after': 2,
+        },
+    )
+    controller = pyoiler_logging.backpressure
+    assert controller is not None
+    handler = List_Handler()
+    root = logging.getLogger('')
+    root.addHandler(handler)
+    log = logging.getLogger('backpressure.test')
+    try:
+        def levels_logged():
+            del handler.records[:]
+            for level in (
+                pyoiler_logging.VERBOSE1,
+                pyoiler_logging.DEBUG,
+                pyoiler_logging.TRACE,
+                pyoiler_logging.INFO,
+                pyoiler_logging.WARNING,
+            ):
+                log.log(level, 'At %d', level)
+            return [
+                record.levelno for record in handler.records
+                if record.name == 'backpressure.test'
+            ]
+
+        assert len(levels_logged()) == 5
+        steps = []
+        for _ in range(4):
+            controller.update(5000, 0.0, 0)
+            steps.append(pyoiler_logging.shed_level)
+        assert steps == [
+            pyoiler_logging.DEBUG,
+            pyoiler_logging.TRACE,
+            pyoiler_logging.INFO,
+            pyoiler_logging.INFO,
+        ]
+        assert levels_logged() == [pyoiler_logging.INFO, pyoiler_logging.WARNING]
+        # Hysteresis: between the restore ratio and the budget, it holds.
+        controller.update(800, 0.0, 0)
+        controller.update(800, 0.0, 0)
+        assert pyoiler_logging.shed_level == pyoiler_logging.INFO
+        controller.update(100, 0.0, 0)
+        assert pyoiler_logging.shed_level == pyoiler_logging.INFO
+        controller.update(100, 0.0, 0)
+        assert pyoiler_logging.shed_level == pyoiler_logging.TRACE
+        for _ in range(4):
+            controller.update(100, 0.0, 0)
+        assert pyoiler_logging.shed_level == 0
+        assert len(levels_logged()) == 5
+    finally:
+        root.removeHandler(handler)
+
+def test_notices(tmpdir):
+    path = tmpdir.join('backpressure.log').strpath
+    init_logging(
+        log_level=pyoiler_logging.DEBUG,
+        log_fname=path,
+        log_to_file=True,
+        log_backpressure={'max_emit_ms': 1.0, 'interval': 3600},
+    )
+    controller = pyoiler_logging.backpressure
+    controller.update(0, 5.0, 0)
+    assert pyoiler_logging.shed_level == pyoiler_logging.TRACE
+    # Turning it off restores the levels.
+    pyoiler_logging.reconfigure(log_backpressure=None)
+    assert pyoiler_logging.shed_level == 0
+    with open(path) as log_f:
+        text = log_f.read()
+    assert 'dropping records below TRCE' in text
+    assert 'Logging backpressure is off' in text
+
+def test_notices_get_past_the_levels(tmpdir):
+    path = tmpdir.join('notices.log').strpath
+    init_logging(
+        log_level=pyoiler_logging.WARNING,
+        log_fname=path,
+        log_to_file=True,
+        level_overrides={'backpressure.chatty': pyoiler_logging.VERBOSE},
+        log_backpressure={'max_records_per_sec': 1000, 'interval': 3600},
+    )
+    (ours,) = pyoiler_logging.logging_handlers
+    ours.setLevel(pyoiler_logging.WARNING)
+    # But someone else's handler keeps its level.
+    alerts = List_Handler()
+    alerts.setLevel(pyoiler_logging.ERROR)
+    root = logging.getLogger('')
+    root.addHandler(alerts)
+    try:
+        pyoiler_logging.backpressure.update(5000, 0.0, 0)
+        assert pyoiler_logging.shed_level == pyoiler_logging.DEBUG
+    finally:
+        root.removeHandler(alerts)
+    with open(path) as log_f:
+        assert 'dropping records below DEBG' in log_f.read()
+    assert not alerts.records
+
+def test_steady_overload_holds():
+    init_logging(
+        log_level=pyoiler_logging.DEBUG,
+        log_backpressure={
+            'max_records_per_sec': 1000,
+            'interval': 3600,
+            'restore_after': 2,
+        },
+    )
+    controller = pyoiler_logging.backpressure
+    controller.update(3100, 0.0, 0)
+    assert pyoiler_logging.shed_level == pyoiler_logging.TRACE
+    # The records shed are counted, by level.
+    log = logging.getLogger('backpressure.test')
+    for _ in range(10):
+        log.debug('Shed')
+    assert controller.shed == {pyoiler_logging.DEBUG: 10}
+    rate, emit_ms, depth, shed_rates = controller.measure()
+    assert set(shed_rates) == set([pyoiler_logging.DEBUG])
+    assert controller.shed == {}
+    # Still overloaded: next to nothing logged, but 3100/sec shed.
+    steps = []
+    for _ in range(8):
+        controller.update(10, 0.0, 0, {pyoiler_logging.DEBUG: 3090})
+        steps.append(pyoiler_logging.shed_level)
+    assert steps == [pyoiler_logging.TRACE] * 8
+    # Once the demand's down, it restores.
+    controller.update(10, 0.0, 0, {pyoiler_logging.DEBUG: 90})
+    controller.update(10, 0.0, 0, {pyoiler_logging.DEBUG: 90})
+    assert pyoiler_logging.shed_level == 0
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import io
+import json
+import logging
+
+import pyoiler_logging
+from pyoiler_logging import *
+from pyoiler_logging import binlog
+init_logging(log_level=0)
+
+def _log_both(tmpdir):
+    text_path = str(tmpdir.join('text.log'))
+    bin_path = str(tmpdir.join('bin.log'))
+    formatter = pyoiler_logging.logging_handlers[0].formatter
+    text_handler = pyoiler_logging.My_FileHandler(text_path)
+    bin_handler = binlog.My_BinaryFileHandler(bin_path)
+    log = logging.getLogger('binlog.test')
+    for handler in (text_handler, bin_handler):
+        handler.setFormatter(formatter)
+        log.addHandler(handler)
+    log.propagate = False
+    try:
+        log.debug('A message')
+        log.info('%d dozen %s jugs, %.2f%%', 5, 'liquor', 99.5)
+        log.warning('%r and %s', object, None)
+        log.error('%(who)s quack', {'who': 'fowl'})
+        log.notice('x' * 300)
+        try:
+            raise ValueError('bright vixens')
+        except ValueError:
+            log.error('Jump', exc_info=True)
+    finally:
+        for handler in (text_handler, bin_handler):
+            log.removeHandler(handler)
+            handler.close()
+    with io.open(text_path, encoding='utf-8') as text_file:
+        return text_file.read(), bin_path
+
+def test_render_text_matches(tmpdir):
+    saved = pyoiler_logging.config
+    pyoiler_logging.config_line_format(0, '| ', 80)
+    try:
+        text, bin_path = _log_both(tmpdir)
+    finally:
+        pyoiler_logging.reconfigure(**saved.as_options())
+    out = io.StringIO()
+    binlog.render_text(bin_path, out)
+    assert out.getvalue() == text
+    assert 'test_binlog._log_both:' in text
+    assert '\n| xxxx' in text
+
+def test_render_json(tmpdir):
+    text, bin_path = _log_both(tmpdir)
+    out = io.StringIO()
+    binlog.render_json(bin_path, out)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(records) == 6
+    assert records[1]['message'] == '5 dozen liquor jugs, 99.50%'
+    assert records[3]['message'] == 'fowl quack'
+    assert records[5]['exc_text'].endswith('ValueError: bright vixens')
+
+def test_partial_frame(tmpdir):
+    text, bin_path = _log_both(tmpdir)
+    with open(bin_path, 'rb') as bin_file:
+        data = bin_file.read()
+    with open(bin_path, 'wb') as bin_file:
+        bin_file.write(data[:-3])
+    records = list(binlog.read_records(bin_path))
+    assert len(records) == 5
+
+def test_number_like_args(tmpdir):
+    import decimal
+    bin_path = str(tmpdir.join('numbers.log'))
+    handler = binlog.My_BinaryFileHandler(bin_path)
+    handler.setFormatter(pyoiler_logging.logging_handlers[0].formatter)
+    log = logging.getLogger('binlog.numbers')
+    log.addHandler(handler)
+    log.propagate = False
+    try:
+        log.info('%d widgets at %.2f', decimal.Decimal(5), decimal.Decimal('1.5'))
+        log.info('%s is %r', decimal.Decimal('1.5'), decimal.Decimal('1.5'))
+        # A mismatch that only shows when rendering doesn't stop the rest.
+        log.info('%d things', object())
+        log.info('Last')
+    finally:
+        log.removeHandler(handler)
+        handler.close()
+    out = io.StringIO()
+    binlog.render_text(bin_path, out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].endswith('5 widgets at 1.50')
+    assert lines[1].endswith("1.5 is Decimal('1.5')")
+    assert '%d things [args: <object object at ' in lines[2]
+    assert lines[3].endswith('Last')
+    out = io.StringIO()
+    binlog.render_json(bin_path, out)
+    assert len(out.getvalue().splitlines()) == 4
+
+def test_tables_are_capped(tmpdir):
+    bin_path = str(tmpdir.join('capped.log'))
+    handler = binlog.My_BinaryFileHandler(bin_path, max_keys=10)
+    handler.setFormatter(pyoiler_logging.logging_handlers[0].formatter)
+    log = logging.getLogger('binlog.capped')
+    log.addHandler(handler)
+    log.propagate = False
+    try:
+        for num in range(25):
+            # Formatted beforehand, so each is its own template.
+            log.info('Widget %d' % (num,))
+            assert len(handler.keys) <= 10
+            assert len(handler.templates) <= 10
+    finally:
+        log.removeHandler(handler)
+        handler.close()
+    out = io.StringIO()
+    binlog.render_text(bin_path, out)
+    lines = out.getvalue().splitlines()
+    assert [line.rsplit(' ', 1)[1] for line in lines] == [str(num) for num in range(25)]
+
+def test_new_header_on_reconfigure(tmpdir):
+    text_path = str(tmpdir.join('text.log'))
+    bin_path = str(tmpdir.join('bin.log'))
+    init_logging(
+        log_level=0, log_line_len=200, log_fname=text_path, log_to_file=True,
+        log_bin_fname=bin_path,
+    )
+    try:
+        log = logging.getLogger('binlog.reconfigured')
+        log.info('x' * 100)
+        pyoiler_logging.reconfigure(log_line_len=40)
+        log.info('y' * 100)
+        log.info('%s', 'z' * 100)
+    finally:
+        init_logging(log_level=0)
+    with io.open(text_path, encoding='utf-8') as text_file:
+        text = text_file.read()
+    out = io.StringIO()
+    binlog.render_text(bin_path, out)
+    assert out.getvalue() == text
+    assert len(text.splitlines()) > 3
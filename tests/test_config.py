@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+def teardown_function(function):
+    init_logging(log_level=0)
+
+def test_immutable():
+    cfg = pyoiler_logging.config
+    with pytest.raises(AttributeError):
+        cfg.line_len_log = 10
+    changed = cfg.replace(log_line_len=100, log_frmat_len=2)
+    assert changed is not cfg
+    assert changed.line_len_log == 100
+    assert changed.msg_continuation_prefix == '  | '
+    assert changed.line_len_msg == 96
+    assert cfg.line_len_log is None
+    with pytest.raises(TypeError):
+        cfg.replace(log_line_length=100)
+
+def test_level_names():
+    cfg = pyoiler_logging.Log_Config(
+        log_level='verbose3',
+        level_overrides={'http': 'WARNING', 'db': 12},
+    )
+    assert cfg.log_level == pyoiler_logging.VERBOSE3
+    assert cfg.level_overrides == {'http': logging.WARNING, 'db': 12}
+
+def test_reconfigure_sinks(tmpdir):
+    log_path = str(tmpdir.join('app.log'))
+    console = pyoiler_logging.handler_sinks[('console',)]
+    pyoiler_logging.reconfigure(log_to_file=True, log_fname=log_path)
+    (file_handler,) = pyoiler_logging.logging_handlers
+    assert file_handler in logging.getLogger('').handlers
+    assert console not in logging.getLogger('').handlers
+    pyoiler_logging.reconfigure(log_line_len=40)
+    # Same sinks, same handler.
+    assert pyoiler_logging.logging_handlers == [file_handler]
+    logging.getLogger('cfg').info('y' * 60)
+    file_handler.flush()
+    with open(log_path) as log_file:
+        lines = log_file.read().splitlines()
+    assert len(lines) > 2
+    assert all(line.startswith('| ') for line in lines[1:])
+
+def test_init_logging_reruns():
+    init_logging(log_level=logging.WARNING, show_logger_name=True)
+    assert pyoiler_logging.config.log_level == logging.WARNING
+    assert logging.getLogger('').level == logging.WARNING
+    assert '%(name)-11s' in pyoiler_logging.logging_handlers[0].formatter._fmt
+
+def test_reconfigure_from_file(tmpdir):
+    config_path = str(tmpdir.join('logging.json'))
+    init_logging(log_level=logging.INFO)
+    with open(config_path, 'w') as config_file:
+        json.dump({'level_overrides': {'db.pool': 'VERBOSE3'}}, config_file)
+    watcher = pyoiler_logging.Config_Watcher(config_path)
+    watcher.last_stat = None
+    watcher.check()
+    assert pyoiler_logging.config.level_overrides == {'db.pool': pyoiler_logging.VERBOSE3}
+    assert logging.getLogger('db.pool').isEnabledFor(pyoiler_logging.VERBOSE3)
+    # Options are relative to init_logging's, not to the last file.
+    with open(config_path, 'w') as config_file:
+        json.dump({'log_level': 'DEBUG', 'extra': 1}, config_file)
+    watcher.last_stat = None
+    watcher.check()
+    assert pyoiler_logging.config.level_overrides == {'db.pool': pyoiler_logging.VERBOSE3}
+    with open(config_path, 'w') as config_file:
+        json.dump({'log_level': 'DEBUG'}, config_file)
+    watcher.last_stat = None
+    watcher.check()
+    assert pyoiler_logging.config.log_level == logging.DEBUG
+    assert not pyoiler_logging.config.level_overrides
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGHUP'), reason='No SIGHUP.')
+def test_sighup_reloads_on_the_watcher_thread(tmpdir):
+    config_path = str(tmpdir.join('logging.json'))
+    init_logging(log_level=logging.INFO)
+    with open(config_path, 'w') as config_file:
+        json.dump({'log_level': 'DEBUG'}, config_file)
+    reloaded_on = []
+    real_reload = pyoiler_logging.reconfigure_from_file
+
+    def reload(path):
+        reloaded_on.append(threading.current_thread())
+        real_reload(path)
+
+    pyoiler_logging.reconfigure_from_file = reload
+    old_handler = signal.getsignal(signal.SIGHUP)
+    try:
+        watcher = pyoiler_logging.reload_on_sighup(config_path)
+        os.kill(os.getpid(), signal.SIGHUP)
+        deadline = time.time() + 5
+        while not reloaded_on and time.time() < deadline:
+            time.sleep(0.01)
+        watcher.stop()
+        watcher.join(5)
+    finally:
+        pyoiler_logging.reconfigure_from_file = real_reload
+        signal.signal(signal.SIGHUP, old_handler)
+    assert reloaded_on == [watcher]
+    assert pyoiler_logging.config.log_level == logging.DEBUG
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import io
+import logging
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+def teardown_function(function):
+    init_logging(log_level=0)
+
+class Plain_Handler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def _log_some(log):
+    log.debug('A message')
+    log.info('%d dozen %s jugs', 5, 'liquor')
+    log.error('%(who)s quack', {'who': 'fowl'})
+    log.notice('x' * 200)
+    try:
+        raise ValueError('bright vixens')
+    except ValueError:
+        log.error('Jump', exc_info=True)
+
+def _capture(fast):
+    init_logging(log_level=0, log_line_len=80, log_fast_records=fast)
+    stream = io.StringIO()
+    handler = pyoiler_logging.My_StreamHandler(stream)
+    handler.setFormatter(pyoiler_logging.log_formatter)
+    plain = Plain_Handler()
+    log = logging.getLogger('fast.test')
+    log.handlers = [handler, plain]
+    log.propagate = False
+    _log_some(log)
+    return stream.getvalue(), plain.records
+
+def test_same_output():
+    slow_text, slow_records = _capture(False)
+    fast_text, fast_records = _capture(True)
+    assert pyoiler_logging.config.fast_records_
+    # (Identical, but for the timestamps, which could tick.)
+    strip = lambda text: [line[:5] + line[29:] for line in text.splitlines()]
+    assert strip(fast_text) == strip(slow_text)
+    assert 'test_fast_records._log_some:' in fast_text
+    # The third-party handler gets a real LogRecord.
+    assert all(type(record) is logging.LogRecord for record in fast_records)
+    assert fast_records[2].getMessage() == 'fowl quack'
+    assert fast_records[0].funcName == '_log_some'
+    assert fast_records[4].exc_info[0] is ValueError
+
+def test_unsupported_format():
+    init_logging(log_level=0, log_fast_records=True, log_frmat='%(process)d %(message)s')
+    assert not pyoiler_logging.config.fast_records_
+
+def test_handler_filters_get_log_records():
+    init_logging(log_level=0, log_fast_records=True)
+
+    class Context_Filter(logging.Filter):
+        def filter(self, record):
+            record.request_id = 'req-7'
+            return True
+
+    stream = io.StringIO()
+    handler = pyoiler_logging.My_StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(request_id)s %(message)s'))
+    handler.addFilter(Context_Filter())
+    log = logging.getLogger('fast.filters')
+    log.handlers = [handler]
+    log.propagate = False
+    log.info('With context')
+    assert stream.getvalue() == 'req-7 With context\n'
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import io
+import logging
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+def teardown_function(function):
+    init_logging(log_level=0)
+
+def _handlers(*layouts):
+    handlers = []
+    for layout in layouts:
+        handler = pyoiler_logging.My_StreamHandler(io.StringIO())
+        handler.setFormatter(pyoiler_logging.log_formatter)
+        handler.layout = layout
+        handlers.append(handler)
+    log = logging.getLogger('layouts.test')
+    log.handlers = handlers
+    log.propagate = False
+    return log, handlers
+
+def test_own_layouts():
+    init_logging(log_level=0, log_line_len=60)
+    narrow = pyoiler_logging.Line_Layout(40, 4, '| ')
+    log, (wrapped, unwrapped, default) = _handlers(narrow, pyoiler_logging.Line_Layout(), None)
+    log.info('x' * 100)
+    lines = wrapped.stream.getvalue().splitlines()
+    assert [len(line) for line in lines[:-1]] == [40] * (len(lines) - 1)
+    assert all(line.startswith('    | ') for line in lines[1:])
+    assert len(unwrapped.stream.getvalue().splitlines()) == 1
+    assert len(default.stream.getvalue().splitlines()[0]) == 60
+
+def test_shared_rendering(monkeypatch):
+    calls = []
+    render = pyoiler_logging.Line_Layout.render
+    monkeypatch.setattr(
+        pyoiler_logging.Line_Layout,
+        'render',
+        lambda self, fmt, record: calls.append(self) or render(self, fmt, record),
+    )
+    layout = pyoiler_logging.Line_Layout(50)
+    log, handlers = _handlers(layout, pyoiler_logging.Line_Layout(50), None)
+    log.info('Once %s', 'only')
+    assert len(calls) == 2
+    assert handlers[0].stream.getvalue() == handlers[1].stream.getvalue()
+
+def test_sink_layouts(tmpdir):
+    path = tmpdir.join('layouts.log').strpath
+    init_logging(
+        log_level=0,
+        log_fname=path,
+        log_to_file=True,
+        log_to_stderr=True,
+        log_line_len=50,
+        log_layouts={'file': {'line_len': None}, 'stderr': {'line_len': 'terminal'}},
+    )
+    handler = pyoiler_logging.handler_sinks[('file', path)]
+    assert handler.layout == pyoiler_logging.Line_Layout(None)
+    assert pyoiler_logging.handler_sinks[('stderr',)].layout.line_len_log >= 1
+    logging.getLogger('layouts.sinks').info('y' * 100)
+    with open(path) as log_f:
+        assert len(log_f.read().splitlines()) == 1
+    pyoiler_logging.reconfigure(log_layouts=None)
+    assert handler.layout is None
+
+def test_records_stay_portable():
+    import json
+    import pickle
+
+    class Keep_Handler(logging.Handler):
+        def emit(self, record):
+            self.record = record
+
+    keeper = Keep_Handler()
+    log, handlers = _handlers(pyoiler_logging.Line_Layout(50), None)
+    log.handlers.append(keeper)
+    # (With extra, it's a LogRecord, not a My_Record.)
+    log.info('Pickle %s', 'me', extra={'who': 'fowl'})
+    assert handlers[0].stream.getvalue()
+    assert 'rendered_' not in keeper.record.__dict__
+    assert pickle.loads(pickle.dumps(keeper.record)).getMessage() == 'Pickle me'
+    json.dumps(keeper.record.__dict__)
+
+def test_records_not_kept_alive():
+    import gc
+    import weakref
+    # A plain Logger, i.e., not My_Logger._log.
+    plain = logging.Logger('layouts.plain')
+    handler = pyoiler_logging.My_StreamHandler(io.StringIO())
+    handler.setFormatter(pyoiler_logging.log_formatter)
+    plain.addHandler(handler)
+    refs = []
+    real_format = handler.format
+    handler.format = lambda record: refs.append(weakref.ref(record)) or real_format(record)
+    plain.info('Let me go')
+    gc.collect()
+    assert len(refs) == 1
+    assert refs[0]() is None
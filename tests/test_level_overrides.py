@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import logging
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+def teardown_function(function):
+    pyoiler_logging.clear_level_overrides()
+    pyoiler_logging.setLevel(0)
+
+def test_logger_override():
+    pyoiler_logging.setLevel(logging.INFO)
+    pyoiler_logging.set_level_overrides({
+        'db.pool': pyoiler_logging.VERBOSE3,
+        'http': logging.WARNING,
+    })
+    assert logging.getLogger('db.pool').isEnabledFor(pyoiler_logging.VERBOSE3)
+    assert logging.getLogger('db.pool.conn').isEnabledFor(pyoiler_logging.VERBOSE3)
+    assert not logging.getLogger('db').isEnabledFor(logging.DEBUG)
+    assert not logging.getLogger('http').isEnabledFor(logging.INFO)
+    assert logging.getLogger('http.client').isEnabledFor(logging.WARNING)
+    assert logging.getLogger('other').isEnabledFor(logging.INFO)
+    # The handlers let the most verbose override through.
+    for handler in pyoiler_logging.logging_handlers:
+        assert handler.level == pyoiler_logging.VERBOSE3
+
+def test_module_override():
+    pyoiler_logging.setLevel(logging.INFO)
+    pyoiler_logging.set_level_override(__name__, logging.DEBUG)
+    assert logging.getLogger('%').isEnabledFor(logging.DEBUG)
+    assert not logging.getLogger('%').isEnabledFor(pyoiler_logging.VERBOSE1)
+    # The more specific (longer) name wins, be it module or logger.
+    pyoiler_logging.set_level_override('some', logging.ERROR)
+    assert logging.getLogger('some').isEnabledFor(logging.DEBUG)
+    long_name = 'some.' + __name__
+    pyoiler_logging.set_level_override(long_name, logging.ERROR)
+    assert not logging.getLogger(long_name).isEnabledFor(logging.WARNING)
+    pyoiler_logging.set_level_override(__name__, None)
+    assert not logging.getLogger('%').isEnabledFor(logging.DEBUG)
+
+def test_lookup_invalidated():
+    pyoiler_logging.setLevel(logging.INFO)
+    pyoiler_logging.set_level_overrides({'cache.me': logging.DEBUG})
+    log = logging.getLogger('cache.me')
+    assert log.isEnabledFor(logging.DEBUG)
+    assert ('cache.me', __name__) in pyoiler_logging.config.override_lookup
+    pyoiler_logging.set_level_override('cache.me', logging.ERROR)
+    assert not log.isEnabledFor(logging.DEBUG)
+    pyoiler_logging.clear_level_overrides()
+    assert not log.isEnabledFor(logging.DEBUG)
+    assert log.isEnabledFor(logging.INFO)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import os
+
+from pyoiler_logging import logquery
+
+LOG_LINES = [
+    'DEBG|2016-Oct-13|Thu|09:59:58|pool.get:12| Early',
+    'ERRR|2016-Oct-13|Thu|10:00:01|pool.get:14| A long error message that',
+    '|  was wrapped onto the next line',
+    'INFO|2016-Oct-13|Thu|10:01:00|http.serve:99| Not an error',
+    'ERRR|2016-Oct-13|Thu|10:02:00|http.serve:99| Another module',
+    'CRIT|2016-Oct-13|Thu|10:03:00|pool.put:20| Traceback follows',
+    'Traceback (most recent call last):',
+    '  File "pool.py", line 20, in put',
+    'ValueError: bright vixens',
+    'ERRR|2016-Oct-13|Thu|10:06:00|pool.get:14| Too late',
+]
+
+def _write(path, lines, mode='w'):
+    with open(path, mode) as log_file:
+        log_file.write('\n'.join(lines) + '\n')
+
+def test_query(tmpdir):
+    path = str(tmpdir.join('app.log'))
+    _write(path, LOG_LINES)
+    records = list(logquery.query(
+        path, level='ERROR', module='pool', since='10:00', until='10:05',
+    ))
+    assert [record.levelname for record in records] == ['ERRR', 'CRIT']
+    assert records[0].unwrapped() == (
+        'ERRR|2016-Oct-13|Thu|10:00:01|pool.get:14| A long error message that'
+        ' was wrapped onto the next line'
+    )
+    assert records[1].text.endswith('ValueError: bright vixens')
+    assert os.path.exists(path + '.idx')
+
+def test_incremental(tmpdir):
+    path = str(tmpdir.join('app.log'))
+    _write(path, LOG_LINES[:3])
+    index = logquery.Log_Index(path)
+    index.update()
+    # The last bucket is held back: it (and its last record) might not
+    # be done.
+    assert index.count == 0
+    _write(path, LOG_LINES[3:], mode='a')
+    index.update()
+    # A bucket a minute, but for the last (10:03, and then 10:06).
+    assert index.count == 4
+    assert index.end == len('\n'.join(LOG_LINES[:5])) + 1
+    # A fresh index loads what's on disk, and the tail comes from the log.
+    index = logquery.Log_Index(path)
+    records = list(index.query(level='ERRR'))
+    assert index.count == 4
+    assert [record.text.split('| ', 1)[1] for record in records] == [
+        'A long error message that\n|  was wrapped onto the next line',
+        'Another module',
+        'Traceback follows\nTraceback (most recent call last):\n'
+        '  File "pool.py", line 20, in put\nValueError: bright vixens',
+        'Too late',
+    ]
+
+def test_rotated(tmpdir):
+    path = str(tmpdir.join('app.log'))
+    _write(path, LOG_LINES)
+    assert len(list(logquery.query(path, module='http'))) == 2
+    _write(path, LOG_LINES[3:5])
+    assert len(list(logquery.query(path, module='http'))) == 2
+    assert len(list(logquery.query(path, module='pool'))) == 0
+
+def test_level_names(tmpdir):
+    path = str(tmpdir.join('app.log'))
+    _write(path, LOG_LINES)
+    records = list(logquery.query(path, level='NOTICE'))
+    assert [record.levelname for record in records] == ['ERRR', 'ERRR', 'CRIT', 'ERRR']
+    records = list(logquery.query(path, level='VERBOSE3'))
+    assert len(records) == 6
+    try:
+        list(logquery.query(path, level='LOUD'))
+    except ValueError:
+        pass
+    else:
+        assert False
+
+def test_buckets_skipped(tmpdir, monkeypatch):
+    path = str(tmpdir.join('big.log'))
+    lines = []
+    for minute in range(60):
+        for second in range(0, 60, 10):
+            level, mod = ('ERRR', 'db.pool') if minute == 42 else ('INFO', 'http')
+            lines.append('%s|2016-Oct-13|Thu|10:%02d:%02d|%s.get:1| At %d:%d' % (
+                level, minute, second, mod, minute, second,
+            ))
+    _write(path, lines)
+    index = logquery.Log_Index(path)
+    index.update()
+    assert index.count == 59
+    scanned = []
+    scan_all = logquery._Scanner.scan_all
+    monkeypatch.setattr(
+        logquery._Scanner,
+        'scan_all',
+        lambda self, start, end: scanned.append((start, end)) or scan_all(self, start, end),
+    )
+    # By time: just that bucket, and the tail.
+    records = list(index.query(since='10:30:00', until='10:30:59'))
+    assert len(records) == 6
+    assert len(scanned) == 2
+    # By level, and by module (or package).
+    for kwargs in ({'level': 'ERROR'}, {'module': 'db'}, {'module': 'db.pool'}):
+        del scanned[:]
+        records = list(index.query(**kwargs))
+        assert [record.text.rsplit(' ', 1)[1] for record in records] == [
+            '42:%d' % (second,) for second in range(0, 60, 10)
+        ]
+        assert len(scanned) <= 3
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import pyoiler_logging
+from pyoiler_logging import *
+from pyoiler_logging import netsink
+init_logging(log_level=0)
+
+class Stream_Listener(threading.Thread):
+    """A stand-in collector, which reads octet-counted frames."""
+
+    def __init__(self, sock):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.sock = sock
+        self.sock.listen(1)
+        self.messages = []
+        self.got = threading.Event()
+        self.start()
+
+    def run(self):
+        conn, _ = self.sock.accept()
+        data = b''
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+            while b' ' in data:
+                length, rest = data.split(b' ', 1)
+                if len(rest) < int(length):
+                    break
+                self.messages.append(rest[:int(length)])
+                data = rest[int(length):]
+                self.got.set()
+        conn.close()
+
+def _logger(handler):
+    handler.setFormatter(pyoiler_logging.log_formatter)
+    log = logging.getLogger('netsink.test')
+    log.handlers = [handler]
+    log.propagate = False
+    return log
+
+def test_syslog_udp():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(5)
+    handler = netsink.My_SyslogHandler(
+        address=server.getsockname(),
+        facility='local0',
+        app_name='tester',
+        hostname='host',
+        flush_interval=0.01,
+    )
+    log = _logger(handler)
+    try:
+        log.warning('Five dozen %s', 'jugs')
+        handler.flush()
+        message = server.recv(65536)
+    finally:
+        handler.close()
+        server.close()
+    # local0 (16) * 8 + warning (4).
+    assert message.startswith(b'<132>1 ')
+    header, msg = message.split(b'\xef\xbb\xbf', 1)
+    created = datetime.datetime.strptime(
+        header.split(b' ')[1].decode('ascii'), '%Y-%m-%dT%H:%M:%S.%fZ',
+    )
+    # (In UTC.)
+    now = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=time.time())
+    assert abs((now - created).total_seconds()) < 60
+    assert header.split(b' ')[2:7] == [
+        b'host', b'tester', str(os.getpid()).encode('ascii'), b'-', b'-',
+    ]
+    assert msg.startswith(b'WARN|')
+    assert b'|test_netsink.test_syslog_udp:' in msg
+    assert msg.endswith(b'| Five dozen jugs')
+
+def test_syslog_tcp_structured_batches():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    listener = Stream_Listener(server)
+    handler = netsink.My_SyslogHandler(
+        address=server.getsockname(),
+        transport='tcp',
+        structured=True,
+        batch_size=10,
+        flush_interval=5.0,
+    )
+    log = _logger(handler)
+    try:
+        for num in range(10):
+            log.error('Quack "%d"', num)
+        assert listener.got.wait(5)
+        handler.flush()
+    finally:
+        handler.close()
+        server.close()
+    listener.join(5)
+    assert len(listener.messages) == 10
+    assert b'[pyoiler@32473 logger="netsink.test" module="test_netsink"' in listener.messages[0]
+    assert listener.messages[9].endswith(b'Quack "9"')
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='No Unix sockets.')
+def test_unix_socket_spools_until_collector_is_up(tmpdir):
+    path = str(tmpdir.join('collector.sock'))
+    handler = netsink.My_UnixSocketHandler(
+        path,
+        structured=True,
+        spool_size=3,
+        flush_interval=0.01,
+        backoff_initial=0.01,
+        backoff_max=0.05,
+    )
+    log = _logger(handler)
+    try:
+        for num in range(5):
+            log.info('Vixen %d', num)
+        # No collector, so the oldest get dropped.
+        handler.flush(timeout=0.1)
+        assert handler.dropped == 2
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        listener = Stream_Listener(server)
+        handler.flush(timeout=5)
+        assert handler.sent == 3
+    finally:
+        handler.close()
+    listener.join(5)
+    server.close()
+    messages = [json.loads(message.decode('utf-8')) for message in listener.messages]
+    assert [message['message'] for message in messages] == [
+        'Vixen 2', 'Vixen 3', 'Vixen 4',
+    ]
+    assert messages[0]['funcName'] == 'test_unix_socket_spools_until_collector_is_up'
+
+def test_syslog_checks_its_address():
+    with pytest.raises(ValueError):
+        netsink.My_SyslogHandler(address='/dev/log', transport='udp')
+    with pytest.raises(ValueError):
+        netsink.My_SyslogHandler(address=('localhost', 514), transport='unix')
+    with pytest.raises(ValueError):
+        netsink.My_SyslogHandler(transport='carrier_pigeon')
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='No Unix sockets.')
+def test_syslog_path_is_unix(tmpdir):
+    path = str(tmpdir.join('log.sock'))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(path)
+    server.settimeout(5)
+    handler = netsink.My_SyslogHandler(address=path, flush_interval=0.01)
+    log = _logger(handler)
+    try:
+        assert handler.transport == 'unix'
+        log.warning('Over the wire')
+        handler.flush()
+        message = server.recv(65536)
+    finally:
+        handler.close()
+        server.close()
+    assert message.endswith(b'| Over the wire')
+
+class Broken_Handler(netsink.My_UnixSocketHandler):
+
+    def connect(self):
+        raise RuntimeError('Not a socket error')
+
+def test_sender_survives_any_error(tmpdir):
+    handler = Broken_Handler(
+        str(tmpdir.join('nobody.sock')),
+        flush_interval=0.01,
+        backoff_initial=0.01,
+        backoff_max=0.05,
+        timeout=0.1,
+    )
+    log = _logger(handler)
+    try:
+        log.info('Still here')
+        handler.flush(timeout=0.2)
+        assert handler.sender.is_alive()
+        # It's back in the spool (or being retried), not lost.
+        with handler.spool_cond:
+            assert handler.queue_depth() == 1
+    finally:
+        handler.close()
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='No Unix sockets.')
+def test_shutdown_waits_once(tmpdir):
+    handler = netsink.My_UnixSocketHandler(
+        str(tmpdir.join('nobody.sock')),
+        flush_interval=0.01,
+        backoff_initial=0.2,
+        timeout=1.0,
+    )
+    log = _logger(handler)
+    log.info('Nobody home')
+    # Like logging.shutdown: flush, then close.
+    start = time.time()
+    assert not handler.flush()
+    flushed = time.time()
+    handler.close()
+    closed = time.time()
+    assert flushed - start < 1.5
+    assert closed - flushed < 0.5
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import logging
+import pstats
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+def teardown_function(function):
+    pyoiler_logging.config_log_profiler(enabled=False, reset=True)
+    init_logging(log_level=0)
+
+def _hot_loop(log):
+    for num in range(10):
+        log.debug('Loop %d of %r', num, list(range(50)))
+        log.verbose5('Not shown %d', num)
+
+def test_costs_per_call_site(tmpdir):
+    init_logging(log_level=pyoiler_logging.DEBUG)
+    log = logging.getLogger('profiler.test')
+    pyoiler_logging.config_log_profiler()
+    assert logging.getLogger('profiler.test').isEnabledFor(logging.DEBUG)
+    _hot_loop(log)
+    pyoiler_logging.config_log_profiler(enabled=False)
+    # Not counted.
+    _hot_loop(log)
+    rows = pyoiler_logging.log_profile_report(log_it=False)
+    sites = dict((row[0], row) for row in rows)
+    shown = [site for site in sites if site.startswith('test_profiler._hot_loop:')]
+    assert len(shown) == 2
+    debug_row = max((sites[site] for site in shown), key=lambda row: row[-1])
+    site, calls, level, message, format, emit, total = debug_row
+    assert calls == 10
+    assert message > 0 and format > 0 and emit > 0
+    assert abs(total - (level + message + format + emit)) < 1e-9
+    quiet_row = min((sites[site] for site in shown), key=lambda row: row[-1])
+    assert quiet_row[1] == 10
+    assert quiet_row[3:6] == (0.0, 0.0, 0.0)
+
+    path = tmpdir.join('logging.prof').strpath
+    pyoiler_logging.log_profile_dump(path)
+    stats = pstats.Stats(path)
+    funcs = dict(((func[2], func[1]), stat) for func, stat in stats.stats.items())
+    assert funcs[('<logging message>', 0)][1] == 10
+    assert any(name == '_hot_loop' for name, _ in funcs)
+
+def test_output_unchanged(tmpdir):
+    path = tmpdir.join('profiled.log').strpath
+    init_logging(log_level=0, log_fname=path, log_to_file=True)
+    pyoiler_logging.config_log_profiler()
+    logging.getLogger('profiler.test').info('%(who)s is 100%%', {'who': 'Dave'})
+    logging.getLogger('profiler.test').info('100%% %s', 'sure')
+    pyoiler_logging.config_log_profiler(enabled=False)
+    with open(path) as log_f:
+        lines = log_f.read().splitlines()
+    assert lines[-2].endswith('Dave is 100%')
+    assert lines[-1].endswith('100% sure')
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import logging
+import threading
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+def teardown_function(function):
+    init_logging(log_level=0)
+    assert pyoiler_logging.thread_buffers is None
+
+def _log_path(tmpdir):
+    path = tmpdir.join('threads.log').strpath
+    init_logging(
+        log_level=0,
+        log_fname=path,
+        log_to_file=True,
+        log_thread_buffers=True,
+        log_frmat='%(created).6f %(message)s',
+    )
+    assert pyoiler_logging.thread_buffers is not None
+    return path
+
+def test_merged_in_order(tmpdir):
+    path = _log_path(tmpdir)
+    log = logging.getLogger('threads.test')
+
+    def worker(num):
+        for count in range(200):
+            log.debug('worker %d count %d', num, count)
+
+    threads = [threading.Thread(target=worker, args=(num,)) for num in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for handler in pyoiler_logging.logging_handlers:
+        handler.flush()
+    with open(path) as log_f:
+        lines = log_f.read().splitlines()
+    assert len(lines) == 8 * 200
+    stamps = [float(line.split(' ', 1)[0]) for line in lines]
+    assert stamps == sorted(stamps)
+    for num in range(8):
+        counts = [
+            int(line.rsplit(' ', 1)[1])
+            for line in lines if (' worker %d ' % (num,)) in line
+        ]
+        assert counts == list(range(200))
+
+def test_no_lock_while_formatting(tmpdir):
+    _log_path(tmpdir)
+    handler = pyoiler_logging.logging_handlers[0]
+    held = []
+
+    class Probe(object):
+        def __str__(self):
+            # Another thread can take the handler lock, so we don't have it.
+            def try_lock():
+                if handler.lock.acquire(False):
+                    handler.lock.release()
+                else:
+                    held.append(True)
+            prober = threading.Thread(target=try_lock)
+            prober.start()
+            prober.join()
+            return 'probe'
+
+    logging.getLogger('threads.test').debug('%s', Probe())
+    handler.flush()
+    assert not held
+
+def test_turned_off_drains(tmpdir):
+    path = _log_path(tmpdir)
+    logging.getLogger('threads.test').info('Last words')
+    pyoiler_logging.reconfigure(log_thread_buffers=False)
+    assert pyoiler_logging.thread_buffers is None
+    with open(path) as log_f:
+        assert log_f.read().endswith('Last words\n')
+
+def test_last_words_of_a_dying_thread():
+    import collections
+    import io
+
+    class Dying_Thread(object):
+        alive = True
+        def is_alive(self):
+            return self.alive
+
+    thread = Dying_Thread()
+    stream = io.StringIO()
+    handler = pyoiler_logging.My_StreamHandler(stream)
+
+    class Racing_Entries(collections.deque):
+        # The thread appends once more, and dies, just as it's drained.
+        def popleft(self):
+            try:
+                return collections.deque.popleft(self)
+            except IndexError:
+                if thread.alive:
+                    thread.alive = False
+                    self.append((0.0, 0, 1, handler, 'Last words', None))
+                raise
+
+    buffers = pyoiler_logging.Thread_Buffers()
+    buffers.stop()
+    buffer = pyoiler_logging.Thread_Buffer(thread, 0)
+    buffer.entries = Racing_Entries()
+    buffers.buffers.append(buffer)
+    buffers.drain(final=True)
+    assert buffers.buffers == [buffer]
+    buffers.drain(final=True)
+    assert buffers.buffers == []
+    assert stream.getvalue() == 'Last words\n'
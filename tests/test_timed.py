@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import logging
+import os
+import re
+import subprocess
+import sys
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+class List_Handler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def setup_function(function):
+    pyoiler_logging.timed_reset()
+
+def teardown_function(function):
+    init_logging(log_level=0)
+
+def _capture():
+    handler = List_Handler()
+    log = logging.getLogger('timed.test')
+    log.handlers = [handler]
+    log.propagate = False
+    return log, handler
+
+def test_nested_spans():
+    log, handler = _capture()
+
+    @timed(logger=log)
+    def inner():
+        return 'inner'
+
+    with timed('outer', logger=log):
+        assert inner() == 'inner'
+    with timed(logger=log):
+        pass
+    assert len(handler.messages) == 3
+    inner_msg, outer_msg, unnamed_msg = handler.messages
+    inner_match = re.match(
+        r'timed: \S*test_timed\.\S*inner: [\d.]+ ms \[span (\d+) < (\d+)\]$',
+        inner_msg,
+    )
+    outer_match = re.match(r'timed: outer: [\d.]+ ms \[span (\d+) < 0\]$', outer_msg)
+    assert inner_match and outer_match
+    assert inner_match.group(2) == outer_match.group(1)
+    assert unnamed_msg.startswith('timed: test_timed.test_nested_spans:')
+    assert unnamed_msg.endswith(' < 0]')
+
+def test_disabled_reads_no_clock(monkeypatch):
+    log, handler = _capture()
+    init_logging(log_level=pyoiler_logging.INFO)
+    reads = []
+    real_clock = pyoiler_logging._span_clock_ns
+    monkeypatch.setattr(
+        pyoiler_logging, '_span_clock_ns', lambda: reads.append(1) or real_clock(),
+    )
+
+    @timed(logger=log)
+    def quiet():
+        return 5
+
+    with timed('quiet', logger=log):
+        assert quiet() == 5
+    assert not reads
+    assert not handler.messages
+    # Aggregating spans are timed regardless (but still not logged).
+    for _ in range(100):
+        with timed('counted', logger=log, aggregate=True):
+            pass
+    assert len(reads) == 200
+    assert not handler.messages
+    rows = pyoiler_logging.timed_report(log_it=False)
+    assert [(row[0], row[1]) for row in rows] == [('counted', 100)]
+    name, count, total, mean, p50, p99 = rows[0]
+    assert 0 <= p50 <= p99 and abs(mean * count - total) < 1e-6
+
+DECORATED_AT_IMPORT = """
+import pyoiler_logging
+
+@pyoiler_logging.timed
+def early():
+    return 'early'
+
+pyoiler_logging.init_logging(log_level=0, log_to_console=True)
+assert early() == 'early'
+pyoiler_logging.notice('Still a My_Logger')
+"""
+
+def test_decorated_before_init():
+    # In its own interpreter, where the '%' logger doesn't exist yet.
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        + [path for path in [env.get('PYTHONPATH')] if path]
+    )
+    output = subprocess.check_output(
+        [sys.executable, '-c', DECORATED_AT_IMPORT],
+        env=env,
+        stderr=subprocess.STDOUT,
+    ).decode('utf-8')
+    assert re.search(r'timed: __main__\.early: [\d.]+ ms', output)
+    assert output.rstrip().endswith('Still a My_Logger')
+
+def test_wrapper_caches_logger(monkeypatch):
+    init_logging(log_level=pyoiler_logging.INFO)
+
+    @timed
+    def quiet():
+        return 5
+
+    assert quiet() == 5
+    lookups = []
+    real_get_logger = logging.getLogger
+    monkeypatch.setattr(
+        logging, 'getLogger', lambda *args: lookups.append(args) or real_get_logger(*args),
+    )
+    for _ in range(10):
+        assert quiet() == 5
+    assert not lookups
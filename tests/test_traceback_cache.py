@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import logging
+import sys
+
+import pyoiler_logging
+from pyoiler_logging import *
+init_logging(log_level=0)
+
+def _fail(what):
+    raise ValueError(what)
+
+def _exc_info(what):
+    try:
+        _fail(what)
+    except ValueError:
+        return sys.exc_info()
+
+def _format(formatter, ei):
+    record = logging.LogRecord('tb', logging.ERROR, __file__, 1, 'Oops', (), ei)
+    return formatter.format(record)
+
+def setup_function(function):
+    pyoiler_logging.traceback_cache.reset()
+
+def teardown_function(function):
+    pyoiler_logging.traceback_cache.dedupe = False
+
+def test_cached_render_matches():
+    formatter = pyoiler_logging.My_Formatter()
+    plain = logging.Formatter()
+    for what in ('first', 'second', 'third'):
+        ei = _exc_info(what)
+        assert _format(formatter, ei) == _format(plain, ei)
+    (entry,) = pyoiler_logging.traceback_cache.entries.values()
+    assert entry[1] == 3
+
+def test_dedupe():
+    pyoiler_logging.traceback_cache.dedupe = True
+    formatter = pyoiler_logging.My_Formatter()
+    first = _format(formatter, _exc_info('first'))
+    assert 'Traceback #1:\nTraceback (most recent call last):' in first
+    assert first.endswith('ValueError: first')
+    again = _format(formatter, _exc_info('again'))
+    assert again == 'Oops Same traceback as #1 (2 times): ValueError: again'
+    # Another raise site is another traceback.
+    try:
+        raise ValueError('elsewhere')
+    except ValueError:
+        other = _format(formatter, sys.exc_info())
+    assert 'Traceback #2:' in other
+
+def test_eviction():
+    cache = pyoiler_logging.Traceback_Cache(max_size=1, dedupe=True)
+    formatter = pyoiler_logging.My_Formatter()
+    assert cache.format(formatter, _exc_info('a')).startswith('Traceback #1:')
+    try:
+        raise KeyError('b')
+    except KeyError:
+        assert cache.format(formatter, sys.exc_info()).startswith('Traceback #2:')
+    assert cache.format(formatter, _exc_info('a')).startswith('Traceback #3:')
+
+def test_dedupe_wraps():
+    pyoiler_logging.traceback_cache.dedupe = True
+    formatter = pyoiler_logging.My_Formatter()
+    layout = pyoiler_logging.Line_Layout(line_len=40)
+    records = []
+    for what in ('first', 'again'):
+        record = logging.LogRecord('tb', logging.ERROR, __file__, 1, 'Oops', (), _exc_info(what))
+        records.append(layout.render(formatter, record))
+    # The first is printed verbatim; the repeat is one message, wrapped.
+    assert records[0].startswith('Oops\nTraceback #1:\n')
+    lines = records[1].split('\n')
+    assert lines[0].startswith('Oops Same traceback as #1 (2 times): ')
+    assert len(lines) == 2
+    assert lines[1].endswith('again')
+
+def _chained(key):
+    try:
+        try:
+            raise KeyError(key)
+        except KeyError as err:
+            # I.e., raise ValueError('outer') from err.
+            outer = ValueError('outer')
+            outer.__cause__ = err
+            raise outer
+    except ValueError:
+        return sys.exc_info()
+
+def test_chained_causes_differ():
+    formatter = pyoiler_logging.My_Formatter()
+    plain = logging.Formatter()
+    for key in ('first-key', 'second-key'):
+        ei = _chained(key)
+        assert _format(formatter, ei) == _format(plain, ei)
+        assert ("KeyError: '%s'" % (key,)) in _format(formatter, ei)
+    pyoiler_logging.traceback_cache.dedupe = True
+    assert 'Same traceback as' not in _format(formatter, _chained('third-key'))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# Last Modified: 2026.10.19 /coding: utf-8
+#  vim:tw=0:ts=4:sw=4:et
+
+import gzip
+import io
+import logging
+import os
+import time
+
+import pyoiler_logging
+from pyoiler_logging import *
+from pyoiler_logging import ziplog
+init_logging(log_level=0)
+
+def _log_both(tmpdir, count, frame_size=4096):
+    text_path = str(tmpdir.join('text.log'))
+    zip_path = str(tmpdir.join('zip.log.gz'))
+    formatter = pyoiler_logging.logging_handlers[0].formatter
+    text_handler = pyoiler_logging.My_FileHandler(text_path)
+    zip_handler = ziplog.My_CompressedFileHandler(
+        zip_path, frame_size=frame_size, fsync=False,
+    )
+    log = logging.getLogger('ziplog.test')
+    for handler in (text_handler, zip_handler):
+        handler.setFormatter(formatter)
+        log.addHandler(handler)
+    log.propagate = False
+    try:
+        for num in range(count):
+            log.debug('Record %d, %s', num, 'x' * (num % 150))
+            if num == count // 2:
+                try:
+                    raise ValueError('bright vixens')
+                except ValueError:
+                    log.error('Jump', exc_info=True)
+    finally:
+        for handler in (text_handler, zip_handler):
+            log.removeHandler(handler)
+            handler.close()
+    with io.open(text_path, encoding='utf-8') as text_file:
+        return text_file.read(), zip_path
+
+def test_same_text(tmpdir):
+    text, zip_path = _log_both(tmpdir, 500)
+    assert ziplog.read_text(zip_path) == text
+    # It's plain gzip, too.
+    with gzip.open(zip_path, 'rb') as zip_file:
+        assert zip_file.read().decode('utf-8') == text
+    frames = ziplog.Compressed_Log(zip_path).frames
+    assert len(frames) > 5
+    assert sum(frame.count for frame in frames) == 501
+    assert os.path.getsize(zip_path) < len(text) / 4
+
+def test_seek_by_time(tmpdir):
+    _, zip_path = _log_both(tmpdir, 500)
+    log = ziplog.Compressed_Log(zip_path)
+    middle = log.frames[3]
+    found = log.find(since=middle.first, until=middle.last)
+    assert middle in found
+    assert len(found) < len(log.frames)
+    assert log.find(since=log.frames[-1].last + 1) == []
+
+def test_crash_recovery(tmpdir):
+    text, zip_path = _log_both(tmpdir, 500)
+    frames = ziplog.Compressed_Log(zip_path).frames
+    # A frame cut short, and an index that missed the last two frames.
+    with open(zip_path, 'ab') as zip_file:
+        zip_file.write(b'\x1f\x8b\x08\x04garbage')
+    index_path = zip_path + '.idx'
+    entry_len = os.path.getsize(index_path) // len(frames)
+    with open(index_path, 'r+b') as index_file:
+        index_file.truncate(os.path.getsize(index_path) - 2 * entry_len)
+    assert len(ziplog.Compressed_Log(zip_path).frames) == len(frames)
+    # Appending repairs it.
+    handler = ziplog.My_CompressedFileHandler(zip_path, fsync=False)
+    handler.setFormatter(pyoiler_logging.logging_handlers[0].formatter)
+    record = logging.makeLogRecord({'msg': 'After the crash', 'levelno': logging.INFO})
+    handler.handle(record)
+    handler.close()
+    recovered = ziplog.read_text(zip_path)
+    assert recovered.startswith(text)
+    assert recovered[len(text):].endswith('After the crash\n')
+    assert len(ziplog.Compressed_Log(zip_path).frames) == len(frames) + 1
+
+def test_keeps_what_is_not_ours(tmpdir):
+    zip_path = tmpdir.join('old.log.gz').strpath
+    with gzip.open(zip_path, 'wb') as old_file:
+        old_file.write(b'Logged before there were frames\n')
+    with open(zip_path, 'rb') as old_file:
+        old = old_file.read()
+    handler = ziplog.My_CompressedFileHandler(zip_path, fsync=False)
+    handler.setFormatter(pyoiler_logging.logging_handlers[0].formatter)
+    record = logging.makeLogRecord({'msg': 'A new frame', 'levelno': logging.INFO})
+    handler.handle(record)
+    handler.close()
+    # Moved aside, not truncated.
+    with open(zip_path + '.unrecognized', 'rb') as old_file:
+        assert old_file.read() == old
+    assert ziplog.read_text(zip_path).endswith('A new frame\n')
+    assert len(ziplog.Compressed_Log(zip_path).frames) == 1
+
+def _frame_count(zip_path, count, wait=5.0):
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        if len(ziplog.Compressed_Log(zip_path).frames) >= count:
+            break
+        time.sleep(0.01)
+    return len(ziplog.Compressed_Log(zip_path).frames)
+
+def test_error_storm(tmpdir):
+    zip_path = tmpdir.join('storm.log.gz').strpath
+    handler = ziplog.My_CompressedFileHandler(
+        zip_path, fsync=False, min_flush_interval=0.2,
+    )
+    handler.setFormatter(pyoiler_logging.logging_handlers[0].formatter)
+    try:
+        for num in range(100):
+            record = logging.makeLogRecord(
+                {'msg': 'Error %d' % (num,), 'levelno': logging.ERROR},
+            )
+            handler.handle(record)
+        # The first error closed a frame; the rest waited out the
+        # interval, and then the closer wrote them, without more records.
+        assert _frame_count(zip_path, 2) == 2
+        assert ziplog.read_text(zip_path).endswith('Error 99\n')
+    finally:
+        handler.close()
+    assert len(ziplog.Compressed_Log(zip_path).frames) == 2
+
+def test_max_frame_age(tmpdir):
+    zip_path = tmpdir.join('aged.log.gz').strpath
+    handler = ziplog.My_CompressedFileHandler(
+        zip_path, fsync=False, max_frame_age=0.1,
+    )
+    handler.setFormatter(pyoiler_logging.logging_handlers[0].formatter)
+    try:
+        record = logging.makeLogRecord({'msg': 'Quiet', 'levelno': logging.INFO})
+        handler.handle(record)
+        assert _frame_count(zip_path, 1) == 1
+        assert ziplog.read_text(zip_path).endswith('Quiet\n')
+    finally:
+        handler.close()